@@ -0,0 +1,41 @@
+from translator import Translator
+from translator.langid import LanguageIdentifier
+
+# Languages the identifier has no profile for, they share a script with profiled ones.
+UNKNOWN = {
+    "vie_Latn": "Tất cả mọi người sinh ra đều được tự do và bình đẳng về nhân phẩm và quyền lợi.",
+    "cym_Latn": "Genir pawb yn rhydd ac yn gydradd â'i gilydd mewn urddas a hawliau.",
+    "mlt_Latn": "Il-bnedmin kollha jitwieldu ħielsa u ugwali fid-dinjità u d-drittijiet.",
+    "kaz_Cyrl": "Барлық адамдар тумысынан азат және қадір-қасиеті мен құқықтары тең болып дүниеге келеді.",
+}
+
+KNOWN = {
+    "eng_Latn": "Please restart the application to apply the new settings.",
+    "fra_Latn": "Veuillez redémarrer l'application pour appliquer les nouveaux paramètres.",
+    "bul_Cyrl": "Моля, рестартирайте приложението, за да приложите новите настройки.",
+}
+
+def test_unknown_languages_are_not_identified():
+    identifier = LanguageIdentifier()
+    for code, text in UNKNOWN.items():
+        assert not identifier.supports(code)
+        assert identifier.detect(text) == (None, 0.0), code
+        assert not identifier.is_language(text, "fra_Latn")
+
+def test_known_languages_are_identified():
+    identifier = LanguageIdentifier()
+    for code, text in KNOWN.items():
+        language, probability = identifier.detect(text)
+        assert language == code
+        assert probability >= 0.9
+
+def test_unknown_source_language_disables_langid():
+    translator = Translator("vie_Latn", "fra_Latn", backend="null", langid=True)
+    assert translator.language_identifier is None
+    translator = Translator("eng_Latn", "fra_Latn", backend="null", langid=True)
+    assert translator.language_identifier is not None
+
+def test_langid_checks_resolved_languages():
+    translator = Translator("en", "fr", backend="null", langid=True)
+    assert (translator.source, translator.target) == ("eng_Latn", "fra_Latn")
+    assert translator.language_identifier is not None
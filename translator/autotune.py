@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import random
+import logging
+import platform
+
+import psutil
+import torch
+
+from translator import utils
+from translator.metrics import rss_mb, PeakRSS
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZES = (8, 16, 32, 64, 128, 256, 512)
+WORKERS = (0, 1, 2)
+
+def default_threads():
+    """Candidate torch thread counts: one, half and all of the available cores"""
+    cores = os.cpu_count() or 1
+    return tuple(sorted({1, max(1, cores // 2), cores}))
+
+def default_budget():
+    """Memory budget in MB when none is given: what the process uses now plus 80% of the available memory"""
+    return rss_mb() + 0.8 * psutil.virtual_memory().available / (1024 * 1024)
+
+def sample_texts(texts, size=256, seed=0):
+    """Draw a reproducible sample of distinct non-empty texts"""
+    texts = [text for text in dict.fromkeys(texts) if text and text.strip()]
+    if len(texts) <= size:
+        return texts
+    return random.Random(seed).sample(texts, size)
+
+def measure(translator, sample, batch_size, threads, num_workers):
+    """Translate a sample with one configuration, returns its throughput and peak memory"""
+    torch.set_num_threads(threads)
+    with PeakRSS() as peak:
+        _t = time.perf_counter()
+        # Skip memory, templates and other caches which would make repeated runs free
+        translator._translate_batches(sample, num_workers, batch_size, {})
+        seconds = time.perf_counter() - _t
+    return {
+        'batch_size': batch_size,
+        'threads': threads,
+        'num_workers': num_workers,
+        'sentences_per_second': len(sample) / seconds,
+        'peak_rss_mb': peak.peak,
+    }
+
+def calibrate(translator, sample, batch_sizes=BATCH_SIZES, threads=None, workers=WORKERS, budget=None):
+    """Find the fastest batch size and thread/worker layout whose peak memory fits in the budget (MB).
+
+    Batch sizes are swept with all threads and one worker first, then thread/worker
+    layouts are tried with the best batch size.
+    """
+    budget = budget or default_budget()
+    threads = threads or default_threads()
+    batch_sizes = sorted(b for b in batch_sizes if b <= max(len(sample), min(batch_sizes)))
+    results = []
+
+    def _run(batch_size, thread_count, num_workers):
+        try:
+            result = measure(translator, sample, batch_size, thread_count, num_workers)
+        except RuntimeError as exception:
+            logger.debug(f"Batch size {batch_size} failed: {exception}")
+            return None
+        results.append(result)
+        logger.debug(f"Calibration: {result}")
+        return result
+
+    def _fits(result):
+        return result is not None and result['peak_rss_mb'] <= budget
+
+    # Warm up so the first configuration does not pay for lazy initialization
+    translator._translate_batches(sample[:batch_sizes[0]], 0, batch_sizes[0], {})
+    best = None
+    for batch_size in batch_sizes:
+        result = _run(batch_size, max(threads), min(1, max(workers)))
+        if not _fits(result):
+            # Larger batches would only use more memory
+            break
+        if best is None or result['sentences_per_second'] > best['sentences_per_second']:
+            best = result
+    if best is None:
+        return (min(results, key=lambda r: r['peak_rss_mb']) if results else None), results
+    for thread_count in threads:
+        for num_workers in workers:
+            if (thread_count, num_workers) == (best['threads'], best['num_workers']):
+                continue
+            result = _run(best['batch_size'], thread_count, num_workers)
+            if _fits(result) and result['sentences_per_second'] > best['sentences_per_second']:
+                best = result
+    return best, results
+
+def _tuning_path(model_id, backend="transformers"):
+    model_name = str(model_id).strip("/").replace("/", "--")
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    return utils.get_cache_dir("autotune") / f"{model_name}.{backend}.{platform.node() or 'localhost'}.{device}.json"
+
+def load_tuning(model_id, backend="transformers"):
+    """Load the configuration stored for a model on this host, None if it was never tuned"""
+    path = _tuning_path(model_id, backend)
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_tuning(model_id, tuning, backend="transformers"):
+    """Store the best configuration of a model on this host"""
+    path = _tuning_path(model_id, backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(tuning, f, indent=2)
+    logger.debug(f"Stored tuning under {path}.")
+    return path
+
+def autotune(translator, texts, sample_size=256, budget=None, cache=False, **kwargs):
+    """Pick (and apply) the batch size, threads and workers of a translator for the given inputs"""
+    tuning = load_tuning(translator.model_id, translator.backend) if cache else None
+    if tuning is None:
+        sample = sample_texts(texts, sample_size)
+        if not sample:
+            return None
+        tuning, _ = calibrate(translator, sample, budget=budget, **kwargs)
+        if tuning is None:
+            return None
+        if cache:
+            save_tuning(translator.model_id, tuning, translator.backend)
+    translator.batch_size = tuning['batch_size']
+    translator.n_proc = tuning['num_workers']
+    torch.set_num_threads(tuning['threads'])
+    return tuning
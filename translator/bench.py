@@ -0,0 +1,268 @@
+import io
+import sys
+import json
+import time
+import random
+import logging
+import platform
+
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from translator import utils, __version__
+from translator.translate import Translator
+from translator.metrics import rss_mb, PeakRSS
+
+logger = logging.getLogger(__name__)
+
+# Text the tiny benchmark model is built from and workloads are drawn from.
+_CORPUS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Le renard brun rapide saute par-dessus le chien paresseux.",
+    "Bonjour le monde, comment allez-vous aujourd'hui ?",
+    "Hello world, how are you doing today?",
+    "Your file has been saved and will be available after the next restart.",
+    "Votre fichier a été enregistré et sera disponible après le prochain redémarrage.",
+    "Click the button below to confirm your e-mail address.",
+    "Cliquez sur le bouton ci-dessous pour confirmer votre adresse e-mail.",
+]
+
+# Number of words per sentence for each input length distribution.
+LENGTHS = {
+    'short': (2, 8),
+    'medium': (8, 24),
+    'long': (24, 64),
+    'mixed': (2, 64),
+}
+
+# Metrics where a larger value is better, every other compared metric is better when smaller.
+_HIGHER_IS_BETTER = ('sentences_per_second', 'tokens_per_second')
+_COMPARED = ('sentences_per_second', 'tokens_per_second', 'p95_latency_ms', 'peak_rss_mb', 'load_seconds')
+
+def build_tiny_model(path=None):
+    """Build (once) a tiny randomly initialized NLLB-like model so benchmarks run offline"""
+    path = Path(path) if path else utils.get_cache_dir("bench", "tiny-nllb")
+    if (path / "config.json").exists():
+        return path
+    import sentencepiece as spm
+    from transformers import NllbTokenizer, M2M100Config, M2M100ForConditionalGeneration
+
+    path.mkdir(parents=True, exist_ok=True)
+    buffer = io.BytesIO()
+    spm.SentencePieceTrainer.train(sentence_iterator=iter(_CORPUS * 50), model_writer=buffer, vocab_size=120, model_type="unigram", character_coverage=1.0, minloglevel=2)
+    (path / "spm.model").write_bytes(buffer.getvalue())
+    tokenizer = NllbTokenizer(vocab_file=str(path / "spm.model"))
+    torch.manual_seed(0)
+    config = M2M100Config(
+        vocab_size=len(tokenizer), d_model=32, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=64, decoder_ffn_dim=64,
+        max_position_embeddings=512, pad_token_id=tokenizer.pad_token_id, bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id, decoder_start_token_id=tokenizer.eos_token_id,
+    )
+    M2M100ForConditionalGeneration(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    (path / "spm.model").unlink()
+    logger.debug(f"Built tiny benchmark model under {path}.")
+    return path
+
+def make_workload(size, lengths='mixed', seed=0):
+    """Generate a reproducible list of sentences whose word counts follow a length distribution"""
+    low, high = LENGTHS[lengths]
+    rng = random.Random(seed)
+    words = " ".join(_CORPUS).split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(low, high))) for _ in range(size)]
+
+def read_corpus(path, size=None):
+    """Read the non-empty lines of a text file (or the files of a directory) as a workload"""
+    files = sorted(utils.glob_files_from_dir(path)) if Path(path).is_dir() else [path]
+    sentences = [line for file in files for line in utils.read_txt(file) if line.strip()]
+    return sentences[:size] if size else sentences
+
+def _translate_backend(translator, batch):
+    return translator.translate(batch, batch_size=len(batch))
+
+def _pipeline_backend(translator, batch):
+    return [t['translation_text'] for t in translator.translator(batch, batch_size=len(batch))]
+
+# Ways of running a batch through a loaded Translator.
+BACKENDS = {
+    'translator': _translate_backend,
+    'pipeline': _pipeline_backend,
+}
+
+def run_case(translator, sentences, batch_size, threads, backend, warmup=1):
+    """Translate a workload batch by batch and measure throughput and per-batch latency"""
+    torch.set_num_threads(threads)
+    run = BACKENDS[backend]
+    batches = [sentences[i:i + batch_size] for i in range(0, len(sentences), batch_size)]
+    for batch in batches[:warmup]:
+        run(translator, batch)
+    latencies, translations = [], []
+    # Sampled during this case only, the lifetime peak of the process never goes down between cases
+    start_rss = rss_mb()
+    with PeakRSS() as peak:
+        _t = time.perf_counter()
+        for batch in batches:
+            _b = time.perf_counter()
+            translations.extend(run(translator, batch))
+            latencies.append(time.perf_counter() - _b)
+        elapsed = time.perf_counter() - _t
+    tokens = sum(translator.count_tokens(sentences)) + sum(translator.count_tokens(translations))
+    latencies = np.array(latencies) * 1000
+    return {
+        'sentences': len(sentences),
+        'seconds': elapsed,
+        'sentences_per_second': len(sentences) / elapsed,
+        'tokens_per_second': tokens / elapsed,
+        'p50_latency_ms': float(np.percentile(latencies, 50)),
+        'p95_latency_ms': float(np.percentile(latencies, 95)),
+        'p99_latency_ms': float(np.percentile(latencies, 99)),
+        'peak_rss_mb': peak.peak,
+        'rss_delta_mb': peak.peak - start_rss,
+    }
+
+def run_benchmark(model_id=None, source_language="eng_Latn", target_language="fra_Latn", batch_sizes=(8, 32), lengths=('short', 'mixed'), threads=(1,), backends=('translator',), size=128, seed=0, max_length=128, options=None, corpus=None):
+    """Run every combination of batch size, length distribution (or the given corpus), thread count and backend"""
+    model_id = str(model_id or build_tiny_model())
+    _t = time.perf_counter()
+    translator = Translator(source_language, target_language, max_length=max_length, model_id=model_id, **(options or {}))
+    load_seconds = time.perf_counter() - _t
+    results = {
+        'version': __version__,
+        'model_id': model_id,
+        'host': platform.node(),
+        'torch': torch.__version__,
+        'load_seconds': load_seconds,
+        'cases': {},
+    }
+    workloads = {'corpus': corpus} if corpus else {length: make_workload(size, length, seed) for length in lengths}
+    for length, sentences in workloads.items():
+        for backend in backends:
+            for thread_count in threads:
+                for batch_size in batch_sizes:
+                    name = f"{backend}/{length}/b{batch_size}/t{thread_count}"
+                    logger.info(f"Running {name}...")
+                    results['cases'][name] = run_case(translator, sentences, batch_size, thread_count, backend)
+    return results
+
+def run_assisted(model_id, draft_model_id, sentences, source_language="eng_Latn", target_language="fra_Latn", batch_size=8, max_length=128, options=None, examples=5):
+    """Translate sentences greedily with and without a draft model, check the outputs are identical and measure the speedup"""
+    model_id = str(model_id or build_tiny_model())
+    translator = Translator(source_language, target_language, max_length=max_length, model_id=model_id, draft_model_id=draft_model_id, **dict(options or {}, num_beams=1))
+    draft_model = translator.draft_model
+    cases = {}
+    try:
+        for name, draft in (('greedy', None), ('assisted', draft_model)):
+            translator.draft_model = draft
+            logger.info(f"Running {name} decoding...")
+            cases[name] = run_case(translator, sentences, batch_size, torch.get_num_threads(), 'translator')
+            cases[name]['translations'] = translator.translate(sentences, batch_size=batch_size)
+    finally:
+        translator.draft_model = draft_model
+    mismatches = [
+        {'source': source, 'greedy': greedy, 'assisted': assisted}
+        for source, greedy, assisted in zip(sentences, cases['greedy'].pop('translations'), cases['assisted'].pop('translations'))
+        if greedy != assisted
+    ]
+    return {
+        'model_id': model_id,
+        'draft_model_id': str(draft_model_id),
+        'sentences': len(sentences),
+        'batch_size': batch_size,
+        'greedy': cases['greedy'],
+        'assisted': cases['assisted'],
+        'speedup': cases['greedy']['seconds'] / cases['assisted']['seconds'],
+        'identical': not mismatches,
+        'mismatches': len(mismatches),
+        'examples': mismatches[:examples],
+    }
+
+def compare(results, baseline, tolerance=0.1):
+    """List the metrics that regressed by more than tolerance (a fraction) compared to a baseline"""
+    regressions = []
+    cases = dict(results['cases'], **{'load': {'load_seconds': results['load_seconds']}})
+    reference = dict(baseline['cases'], **{'load': {'load_seconds': baseline['load_seconds']}})
+    for name, metrics in cases.items():
+        for metric in _COMPARED:
+            if metric not in metrics or metric not in reference.get(name, {}):
+                continue
+            before, after = reference[name][metric], metrics[metric]
+            if metric in _HIGHER_IS_BETTER:
+                regressed = after < before * (1 - tolerance)
+            else:
+                regressed = after > before * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{name} {metric}: {before:.2f} -> {after:.2f}")
+    return regressions
+
+def _split_list(value, cast=str):
+    return tuple(cast(v) for v in value.split(",") if v)
+
+def main():
+    parser = ArgumentParser(description="Benchmark translation throughput and latency on reproducible workloads.")
+    parser.add_argument('-m', '--model_id', type=str, help="Model to benchmark (default: a tiny model built locally).")
+    parser.add_argument('-s', '--source', type=str, default="eng_Latn", help="Source language.")
+    parser.add_argument('-t', '--target', type=str, default="fra_Latn", help="Target language.")
+    parser.add_argument('-b', '--batch_sizes', type=str, default="8,32", help="Comma separated batch sizes.")
+    parser.add_argument('-l', '--lengths', type=str, default="short,mixed", help=f"Comma separated input length distributions among {', '.join(LENGTHS)}.")
+    parser.add_argument('-n', '--threads', type=str, default="1", help="Comma separated torch thread counts.")
+    parser.add_argument('-k', '--backends', type=str, default="translator", help=f"Comma separated backends among {', '.join(BACKENDS)}.")
+    parser.add_argument('--size', type=int, default=128, help="Number of sentences per workload.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generated workloads.")
+    parser.add_argument('--max_length', type=int, default=128, help="Max length of the model.")
+    parser.add_argument('-o', '--output', type=str, help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', type=str, help="Compare the results to this JSON file and fail on regressions.")
+    parser.add_argument('--save_baseline', type=str, help="Save the results as a baseline JSON file.")
+    parser.add_argument('--corpus', type=str, help="Text file (or directory) whose lines are used as the workload instead of generated sentences.")
+    parser.add_argument('--draft_model_id', type=str, help="Also compare greedy decoding with assisted decoding using this draft model, failing if translations differ.")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Fraction a metric may regress before failing (default: 0.1).")
+    args = parser.parse_args()
+
+    corpus = read_corpus(args.corpus, args.size) if args.corpus else None
+    results = run_benchmark(
+        model_id=args.model_id,
+        source_language=args.source,
+        target_language=args.target,
+        batch_sizes=_split_list(args.batch_sizes, int),
+        lengths=_split_list(args.lengths),
+        threads=_split_list(args.threads, int),
+        backends=_split_list(args.backends),
+        size=args.size,
+        seed=args.seed,
+        max_length=args.max_length,
+        corpus=corpus,
+    )
+    if args.draft_model_id:
+        results['assisted'] = run_assisted(
+            args.model_id,
+            args.draft_model_id,
+            corpus or make_workload(args.size, _split_list(args.lengths)[-1], args.seed),
+            source_language=args.source,
+            target_language=args.target,
+            batch_size=_split_list(args.batch_sizes, int)[0],
+            max_length=args.max_length,
+        )
+    report = json.dumps(results, indent=2)
+    print(report)
+    for output in (args.output, args.save_baseline):
+        if output:
+            with open(output, 'w') as f:
+                f.write(report)
+    if args.draft_model_id and not results['assisted']['identical']:
+        print(f"Assisted decoding changed {results['assisted']['mismatches']} translation(s).", file=sys.stderr)
+        sys.exit(1)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print(f"No regression against {args.baseline}.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import logging
+
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as compute
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+ARROW_SUFFIXES = (".arrow", ".arrows", ".ipc", ".feather")
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+# Columns read as source text from Arrow and Parquet inputs, in order of preference.
+TEXT_COLUMNS = ("text", "source")
+
+SCHEMA = pa.schema([
+    ("source", pa.string()),
+    ("translation", pa.string()),
+    ("source_language", pa.string()),
+    ("target_language", pa.string()),
+    ("model_id", pa.string()),
+])
+
+def is_columnar(path):
+    """Tell whether a path is an Arrow IPC or Parquet file"""
+    return str(path).lower().endswith(ARROW_SUFFIXES + PARQUET_SUFFIXES)
+
+def _is_parquet(path):
+    return str(path).lower().endswith(PARQUET_SUFFIXES)
+
+def glob_columnar_files(directory):
+    """Get the Arrow IPC and Parquet files of a directory"""
+    return sorted(str(p) for p in Path(directory).iterdir() if p.is_file() and is_columnar(p) and ".tmp." not in p.name)
+
+def read_table(path, columns=None):
+    """Read an Arrow IPC (file or stream) or Parquet file, memory-mapped.
+
+    A stream cut short by a crash yields the record batches written before it.
+    """
+    if _is_parquet(path):
+        return pq.read_table(path, columns=columns, memory_map=True)
+    source = pa.memory_map(str(path), 'r')
+    try:
+        table = pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        batches = []
+        try:
+            for batch in reader:
+                batches.append(batch)
+        except (pa.ArrowInvalid, OSError) as exception:
+            logger.warning(f"{path} is truncated, using its first {len(batches)} record batch(es): {exception}")
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+    return table.select(columns) if columns else table
+
+def read_texts(path):
+    """Read the source text column of an Arrow IPC or Parquet input file"""
+    schema = pq.read_schema(path) if _is_parquet(path) else read_table(path).schema
+    for column in TEXT_COLUMNS:
+        if column in schema.names:
+            texts = read_table(path, [column]).column(column)
+            # Same type and empty lines as the text loader
+            return compute.fill_null(texts.cast(pa.string()), "")
+    raise ValueError(f"{path} has none of the columns {', '.join(TEXT_COLUMNS)}.")
+
+def read_pairs(path):
+    """Read the source and translation columns of an output file (or its unfinished part), None if there is none"""
+    part = f"{path}.part"
+    for candidate in (part, path):
+        if not Path(candidate).is_file() or (candidate == part and _is_parquet(path)):
+            # An unfinished Parquet file has no footer and cannot be read
+            continue
+        try:
+            table = read_table(candidate, ["source", "translation"])
+        except (pa.ArrowInvalid, OSError) as exception:
+            logger.warning(f"Cannot read {candidate}: {exception}")
+            continue
+        return table.column("source"), table.column("translation")
+    return None
+
+def untranslated(sources, translated):
+    """Filter the sources (Arrow array or list) that are not among the translated ones"""
+    sources = pa.chunked_array([sources]) if isinstance(sources, list) else sources
+    if translated is None or len(translated) == 0:
+        return sources
+    return compute.filter(sources, compute.invert(compute.is_in(sources, value_set=pa.concat_arrays(translated.chunks) if isinstance(translated, pa.ChunkedArray) else translated)))
+
+class TranslationWriter:
+    """Write source/translation pairs with their metadata incrementally, one record batch per call.
+
+    Rows of a previous run are copied first (memory-mapped, without decoding). Arrow IPC
+    output is written as a stream so every completed batch survives a crash; Parquet output
+    gets one row group per batch and becomes readable once closed. The file is written as
+    <path>.part and moved in place on close.
+    """
+
+    def __init__(self, path, source_language, target_language, model_id, previous=None) -> None:
+        self.path = str(path)
+        self.part = f"{self.path}.part"
+        self.metadata = {'source_language': source_language, 'target_language': target_language, 'model_id': str(model_id)}
+        Path(self.part).parent.mkdir(parents=True, exist_ok=True)
+        if Path(self.part).exists():
+            # Previous rows may be memory-mapped from the unfinished part of a crashed run
+            os.replace(self.part, f"{self.part}.old")
+        if _is_parquet(self.path):
+            self._writer = pq.ParquetWriter(self.part, SCHEMA)
+        else:
+            self._writer = pa.ipc.new_stream(self.part, SCHEMA)
+        self.rows = 0
+        if previous is not None:
+            sources, translations = previous
+            self.write(sources, translations)
+
+    def write(self, sources, translations):
+        """Append a record batch of sources and their translations"""
+        if len(sources) == 0:
+            return
+        n = len(sources)
+        sources = sources if isinstance(sources, (pa.Array, pa.ChunkedArray)) else pa.array(sources, pa.string())
+        translations = translations if isinstance(translations, (pa.Array, pa.ChunkedArray)) else pa.array(translations, pa.string())
+        columns = [sources, translations] + [pa.array([value] * n, pa.string()) for value in self.metadata.values()]
+        table = pa.Table.from_arrays(columns, schema=SCHEMA)
+        self._writer.write_table(table)
+        self.rows += n
+
+    def close(self):
+        """Finish the file and move it in place"""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        os.replace(self.part, self.path)
+        if Path(f"{self.part}.old").exists():
+            os.remove(f"{self.part}.old")
+        logger.debug(f"Wrote {self.rows} translation(s) to {self.path}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,60 @@
+import gc
+import logging
+
+import torch
+
+from translator.metrics import rss_mb
+
+logger = logging.getLogger(__name__)
+
+def is_out_of_memory(exception):
+    """Tell whether an exception is an allocation failure"""
+    return isinstance(exception, MemoryError) or "out of memory" in str(exception).lower() or "failed to allocate" in str(exception).lower()
+
+class MemoryGuard:
+    """Adaptive cap on the number of sentences generated at once.
+
+    The cap is halved whenever a batch fails to allocate or the process goes over its
+    resident memory budget (in MB), and doubled back after a run of successful batches
+    under the budget so long jobs stay close to the memory ceiling.
+    """
+
+    def __init__(self, max_rss=None, recover_after=16, headroom=0.9) -> None:
+        self.max_rss = max_rss
+        self.recover_after = recover_after
+        self.headroom = headroom
+        self.limit = None
+        self.successes = 0
+        self.backoffs = 0
+
+    def relieve(self):
+        """Release cached memory"""
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def under_pressure(self):
+        """Check whether the process is over its memory budget, after trying to release memory"""
+        if not self.max_rss or rss_mb() <= self.max_rss:
+            return False
+        self.relieve()
+        return rss_mb() > self.max_rss
+
+    def back_off(self, batch_size):
+        """Halve the cap below the size of a batch that did not fit"""
+        self.limit = max(1, batch_size // 2)
+        self.successes = 0
+        self.backoffs += 1
+        logger.debug(f"Backing off to batches of {self.limit} sentence(s).")
+        return self.limit
+
+    def succeeded(self, batch_size, max_batch_size):
+        """Account for a successful batch and grow the cap back when memory allows it"""
+        if self.limit is None:
+            return
+        self.successes += 1
+        if self.successes < self.recover_after or (self.max_rss and rss_mb() > self.headroom * self.max_rss):
+            return
+        self.successes = 0
+        self.limit = self.limit * 2 if self.limit * 2 < max_batch_size else None
+        logger.debug(f"Growing batches back to {self.limit or max_batch_size} sentence(s).")
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+
+from pathlib import Path
+
+from translator import utils
+
+logger = logging.getLogger(__name__)
+
+def default_worker_id():
+    """Identify this process across hosts sharing a job directory"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _create_exclusive(path, content=""):
+    # O_EXCL creation is atomic, also on NFS v3+, so only one process wins
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    return True
+
+def _write_atomic(path, content):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(tmp, 'w') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+class JobQueue:
+    """Queue of translation chunks shared by worker processes through a directory.
+
+    Each chunk is pending (only its sources exist), leased (a lease file names its
+    worker and expiry) or done (its translations exist). Leases are renewed while a
+    chunk is being translated, so the chunks of dead workers are retaken once their
+    lease expires and faster workers simply take more chunks.
+    """
+
+    def __init__(self, directory, lease_seconds=600, worker_id=None) -> None:
+        self.directory = Path(directory)
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or default_worker_id()
+
+    def _path(self, chunk, kind):
+        return self.directory / f"chunk-{chunk:06d}.{kind}"
+
+    @property
+    def _ready(self):
+        return self.directory / "READY"
+
+    def chunks(self):
+        """Get the ids of all chunks"""
+        with open(self._ready, 'r') as f:
+            return list(range(json.load(f)['chunks']))
+
+    def create(self, texts, chunk_size=1000, timeout=600):
+        """Split texts into chunks, only the first worker does it, the others wait until it is done"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if _create_exclusive(self.directory / "CREATING", self.worker_id):
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            for chunk, sources in enumerate(chunks):
+                utils.save_txt(sources, self._path(chunk, "src.txt"))
+            _write_atomic(self._ready, json.dumps({'chunks': len(chunks), 'sentences': len(texts), 'creator': self.worker_id}))
+            logger.debug(f"Created {len(chunks)} chunk(s) of up to {chunk_size} sentence(s) in {self.directory}.")
+            return True
+        _t = time.time()
+        while not self._ready.exists():
+            if time.time() - _t > timeout:
+                raise TimeoutError(f"Job queue in {self.directory} was not created within {timeout} seconds.")
+            time.sleep(0.5)
+        return False
+
+    def _read_lease(self, chunk):
+        try:
+            with open(self._path(chunk, "lease"), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            # Missing or being written, assume it is alive
+            return None
+
+    def _lease_content(self):
+        return json.dumps({'worker': self.worker_id, 'expires': time.time() + self.lease_seconds})
+
+    def lease(self):
+        """Lease the next chunk that is pending or whose lease expired, None if there is none"""
+        for chunk in self.chunks():
+            if self._path(chunk, "done.txt").exists():
+                continue
+            lease = self._path(chunk, "lease")
+            if _create_exclusive(lease, self._lease_content()):
+                return chunk
+            current = self._read_lease(chunk)
+            if current is None or current['expires'] > time.time():
+                continue
+            # Only one worker can move the expired lease away, that one retakes the chunk
+            stale = lease.with_name(f"{lease.name}.{self.worker_id.replace(os.sep, '_')}.stale")
+            try:
+                os.rename(lease, stale)
+            except FileNotFoundError:
+                continue
+            os.remove(stale)
+            if _create_exclusive(lease, self._lease_content()):
+                logger.debug(f"Retook chunk {chunk} from {current['worker']} whose lease expired.")
+                return chunk
+        return None
+
+    def renew(self, chunk):
+        """Extend the lease of a chunk held by this worker, False if it was lost"""
+        current = self._read_lease(chunk)
+        if current is None or current['worker'] != self.worker_id:
+            return False
+        _write_atomic(self._path(chunk, "lease"), self._lease_content())
+        return True
+
+    def sources(self, chunk):
+        """Get the source sentences of a chunk"""
+        return utils.read_txt(self._path(chunk, "src.txt"))
+
+    def complete(self, chunk, translations):
+        """Store the translations of a chunk and release its lease"""
+        _write_atomic(self._path(chunk, "done.txt"), "\n".join(translations))
+        try:
+            os.remove(self._path(chunk, "lease"))
+        except FileNotFoundError:
+            pass
+
+    def status(self):
+        """Count pending, leased and done chunks"""
+        status = {'pending': 0, 'leased': 0, 'done': 0}
+        for chunk in self.chunks():
+            if self._path(chunk, "done.txt").exists():
+                status['done'] += 1
+            elif self._path(chunk, "lease").exists():
+                status['leased'] += 1
+            else:
+                status['pending'] += 1
+        return status
+
+    def finished(self):
+        """Tell whether every chunk is done"""
+        return all(self._path(chunk, "done.txt").exists() for chunk in self.chunks())
+
+    def results(self):
+        """Get all sources and their translations in chunk order"""
+        sources, translations = [], []
+        for chunk in self.chunks():
+            sources += self.sources(chunk)
+            translations += utils.read_txt(self._path(chunk, "done.txt"))
+        return sources, translations
+
+    def claim_results(self):
+        """Let exactly one worker collect the results once every chunk is done"""
+        collecting = self.directory / "COLLECTING"
+        try:
+            if _create_exclusive(collecting, self.worker_id):
+                return True
+            if time.time() - collecting.stat().st_mtime < self.lease_seconds:
+                return False
+            # The collecting worker died before writing the results
+            stale = collecting.with_name(f"COLLECTING.{self.worker_id.replace(os.sep, '_')}.stale")
+            os.rename(collecting, stale)
+            os.remove(stale)
+            return _create_exclusive(collecting, self.worker_id)
+        except FileNotFoundError:
+            return False
+
+    def work(self, translate, poll_seconds=None, on_chunk=None):
+        """Translate chunks until every chunk is done, returns the number of chunks this worker translated"""
+        poll_seconds = poll_seconds or min(5.0, self.lease_seconds / 10)
+        translated = 0
+        while True:
+            try:
+                chunk = self.lease()
+                if chunk is None and self.finished():
+                    return translated
+            except FileNotFoundError:
+                # The results were collected and the queue removed meanwhile
+                return translated
+            if chunk is None:
+                # Chunks are leased by others, wait to retake them if their workers die
+                time.sleep(poll_seconds)
+                continue
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(chunk, stop), daemon=True)
+            heartbeat.start()
+            try:
+                sources = self.sources(chunk)
+                translations = translate(sources)
+            finally:
+                stop.set()
+                heartbeat.join()
+            if len(translations) != len(sources):
+                raise RuntimeError(f"Chunk {chunk}: {len(translations)} translation(s) for {len(sources)} source(s).")
+            self.complete(chunk, translations)
+            translated += 1
+            if on_chunk:
+                try:
+                    on_chunk(chunk, len(sources))
+                except FileNotFoundError:
+                    return translated
+
+    def _heartbeat(self, chunk, stop):
+        while not stop.wait(self.lease_seconds / 3):
+            if not self.renew(chunk):
+                logger.warning(f"Lost the lease of chunk {chunk}.")
+                return
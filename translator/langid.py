@@ -0,0 +1,215 @@
+import time
+import logging
+import unicodedata
+
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from translator import utils
+from translator.language import SCRIPTS, get_nllb_lang
+
+logger = logging.getLogger(__name__)
+
+# Built-in text samples (UDHR articles 1 and 3 and an everyday sentence) used to
+# train the character n-gram profiles of languages sharing a script.
+_SAMPLES = {
+    "eng_Latn": "All human beings are born free and equal in dignity and rights. They are endowed with reason and conscience and should act towards one another in a spirit of brotherhood. Everyone has the right to life, liberty and security of person. The weather is nice today and we are going to the market with our friends.",
+    "fra_Latn": "Tous les êtres humains naissent libres et égaux en dignité et en droits. Ils sont doués de raison et de conscience et doivent agir les uns envers les autres dans un esprit de fraternité. Tout individu a droit à la vie, à la liberté et à la sûreté de sa personne. Il fait beau aujourd'hui et nous allons au marché avec nos amis.",
+    "deu_Latn": "Alle Menschen sind frei und gleich an Würde und Rechten geboren. Sie sind mit Vernunft und Gewissen begabt und sollen einander im Geist der Brüderlichkeit begegnen. Jeder hat das Recht auf Leben, Freiheit und Sicherheit der Person. Das Wetter ist heute schön und wir gehen mit unseren Freunden auf den Markt.",
+    "spa_Latn": "Todos los seres humanos nacen libres e iguales en dignidad y derechos y, dotados como están de razón y conciencia, deben comportarse fraternalmente los unos con los otros. Todo individuo tiene derecho a la vida, a la libertad y a la seguridad de su persona. Hoy hace buen tiempo y vamos al mercado con nuestros amigos.",
+    "ita_Latn": "Tutti gli esseri umani nascono liberi ed eguali in dignità e diritti. Essi sono dotati di ragione e di coscienza e devono agire gli uni verso gli altri in spirito di fratellanza. Ogni individuo ha diritto alla vita, alla libertà ed alla sicurezza della propria persona. Oggi fa bel tempo e andiamo al mercato con i nostri amici.",
+    "por_Latn": "Todos os seres humanos nascem livres e iguais em dignidade e em direitos. Dotados de razão e de consciência, devem agir uns para com os outros em espírito de fraternidade. Todo o indivíduo tem direito à vida, à liberdade e à segurança pessoal. Hoje o tempo está bom e vamos ao mercado com os nossos amigos.",
+    "cat_Latn": "Tots els éssers humans neixen lliures i iguals en dignitat i en drets. Són dotats de raó i de consciència, i han de comportar-se fraternalment els uns amb els altres. Tota persona té dret a la vida, a la llibertat i a la seguretat de la seva persona. Avui fa bon temps i anem al mercat amb els nostres amics.",
+    "ron_Latn": "Toate ființele umane se nasc libere și egale în demnitate și în drepturi. Ele sunt înzestrate cu rațiune și conștiință și trebuie să se comporte unele față de altele în spiritul fraternității. Orice ființă umană are dreptul la viață, la libertate și la securitatea persoanei sale. Astăzi vremea este frumoasă și mergem la piață cu prietenii noștri.",
+    "nld_Latn": "Alle mensen worden vrij en gelijk in waardigheid en rechten geboren. Zij zijn begiftigd met verstand en geweten, en behoren zich jegens elkander in een geest van broederschap te gedragen. Een ieder heeft het recht op leven, vrijheid en onschendbaarheid van zijn persoon. Het weer is vandaag mooi en we gaan met onze vrienden naar de markt.",
+    "swe_Latn": "Alla människor är födda fria och lika i värde och rättigheter. De har utrustats med förnuft och samvete och bör handla gentemot varandra i en anda av broderskap. Var och en har rätt till liv, frihet och personlig säkerhet. Vädret är fint idag och vi går till torget med våra vänner.",
+    "dan_Latn": "Alle mennesker er født frie og lige i værdighed og rettigheder. De er udstyret med fornuft og samvittighed, og de bør handle mod hverandre i en broderskabets ånd. Enhver har ret til liv, frihed og personlig sikkerhed. Vejret er dejligt i dag, og vi går på markedet med vores venner.",
+    "nob_Latn": "Alle mennesker er født frie og med samme menneskeverd og menneskerettigheter. De er utstyrt med fornuft og samvittighet og bør handle mot hverandre i brorskapets ånd. Enhver har rett til liv, frihet og personlig sikkerhet. Været er fint i dag, og vi går på torget med vennene våre.",
+    "fin_Latn": "Kaikki ihmiset syntyvät vapaina ja tasavertaisina arvoltaan ja oikeuksiltaan. Heille on annettu järki ja omatunto, ja heidän on toimittava toisiaan kohtaan veljeyden hengessä. Jokaisella on oikeus elämään, vapauteen ja henkilökohtaiseen turvallisuuteen. Tänään on kaunis sää ja menemme torille ystäviemme kanssa.",
+    "pol_Latn": "Wszyscy ludzie rodzą się wolni i równi pod względem swej godności i swych praw. Są oni obdarzeni rozumem i sumieniem i powinni postępować wobec innych w duchu braterstwa. Każdy człowiek ma prawo do życia, wolności i bezpieczeństwa swej osoby. Dzisiaj jest ładna pogoda i idziemy na targ z naszymi przyjaciółmi.",
+    "ces_Latn": "Všichni lidé rodí se svobodní a sobě rovní co do důstojnosti a práv. Jsou nadáni rozumem a svědomím a mají spolu jednat v duchu bratrství. Každý má právo na život, svobodu a osobní bezpečnost. Dnes je hezké počasí a jdeme s přáteli na trh.",
+    "hun_Latn": "Minden emberi lény szabadnak születik és egyenlő méltósága és joga van. Az emberek, ésszel és lelkiismerettel bírván, egymással szemben testvéri szellemben kell hogy viseltessenek. Minden személynek joga van az élethez, a szabadsághoz és a személyi biztonsághoz. Ma szép idő van, és a barátainkkal a piacra megyünk.",
+    "tur_Latn": "Bütün insanlar hür, haysiyet ve haklar bakımından eşit doğarlar. Akıl ve vicdana sahiptirler ve birbirlerine karşı kardeşlik zihniyeti ile hareket etmelidirler. Yaşamak, hürriyet ve kişi emniyeti her ferdin hakkıdır. Bugün hava güzel ve arkadaşlarımızla pazara gidiyoruz.",
+    "ind_Latn": "Semua orang dilahirkan merdeka dan mempunyai martabat dan hak-hak yang sama. Mereka dikaruniai akal dan hati nurani dan hendaknya bergaul satu sama lain dalam semangat persaudaraan. Setiap orang berhak atas kehidupan, kebebasan dan keselamatan sebagai individu. Hari ini cuacanya bagus dan kami pergi ke pasar bersama teman-teman kami.",
+    "lit_Latn": "Visi žmonės gimsta laisvi ir lygūs savo orumu ir teisėmis. Jiems suteiktas protas ir sąžinė ir jie turi elgtis vienas kito atžvilgiu kaip broliai. Kiekvienas žmogus turi teisę į gyvybę, laisvę ir asmens saugumą.",
+    "lvs_Latn": "Visi cilvēki piedzimst brīvi un vienlīdzīgi savā pašcieņā un tiesībās. Viņi ir apveltīti ar saprātu un sirdsapziņu, un viņiem jāizturas citam pret citu brālības garā. Ikvienam ir tiesības uz dzīvību, brīvību un personas neaizskaramību.",
+    "est_Latn": "Kõik inimesed sünnivad vabadena ja võrdsetena oma väärikuselt ja õigustelt. Neile on antud mõistus ja südametunnistus ja nende suhtumist üksteisesse peab kandma vendluse vaim. Igaühel on õigus elule, vabadusele ja isikupuutumatusele.",
+    "slk_Latn": "Všetci ľudia sa rodia slobodní a sebe rovní, čo sa týka ich dôstojnosti a práv. Sú obdarení rozumom a svedomím a majú spolu jednať v bratskom duchu. Každý má právo na život, slobodu a osobnú bezpečnosť.",
+    "slv_Latn": "Vsi ljudje se rodijo svobodni in imajo enako dostojanstvo in enake pravice. Obdarjeni so z razumom in vestjo in bi morali ravnati drug z drugim kakor bratje. Vsakdo ima pravico do življenja, prostosti in osebne varnosti.",
+    "hrv_Latn": "Sva ljudska bića rađaju se slobodna i jednaka u dostojanstvu i pravima. Ona su obdarena razumom i sviješću pa bi jedna prema drugima trebala postupati u duhu bratstva. Svatko ima pravo na život, slobodu i osobnu sigurnost.",
+    "glg_Latn": "Tódolos seres humanos nacen libres e iguais en dignidade e dereitos e, dotados como están de razón e conciencia, débense comportar fraternalmente uns cos outros. Todo individuo ten dereito á vida, á liberdade e á seguridade da súa persoa.",
+    "afr_Latn": "Alle menslike wesens word vry, met gelyke waardigheid en regte, gebore. Hulle het rede en gewete en behoort in die gees van broederskap teenoor mekaar op te tree. Elkeen het die reg op lewe, vryheid en sekerheid van persoon.",
+    "tgl_Latn": "Ang lahat ng tao ay isinilang na malaya at pantay-pantay sa karangalan at mga karapatan. Sila ay pinagkalooban ng katwiran at budhi at dapat magturingan sa isa't isa sa diwa ng pagkakapatiran. Ang bawat tao'y may karapatan sa buhay, kalayaan at kapanatagan ng sarili.",
+    "rus_Cyrl": "Все люди рождаются свободными и равными в своем достоинстве и правах. Они наделены разумом и совестью и должны поступать в отношении друг друга в духе братства. Каждый человек имеет право на жизнь, на свободу и на личную неприкосновенность. Сегодня хорошая погода, и мы идём на рынок с нашими друзьями.",
+    "ukr_Cyrl": "Всі люди народжуються вільними і рівними у своїй гідності та правах. Вони наділені розумом і совістю і повинні діяти у відношенні один до одного в дусі братерства. Кожна людина має право на життя, на свободу і на особисту недоторканність. Сьогодні гарна погода, і ми йдемо на ринок з нашими друзями.",
+    "bul_Cyrl": "Всички хора се раждат свободни и равни по достойнство и права. Те са надарени с разум и съвест и следва да се отнасят помежду си в дух на братство. Всеки човек има право на живот, свобода и лична сигурност. Днес времето е хубаво и отиваме на пазара с нашите приятели.",
+    "srp_Cyrl": "Сва људска бића рађају се слободна и једнака у достојанству и правима. Она су обдарена разумом и свешћу и треба једни према другима да поступају у духу братства. Свако има право на живот, слободу и безбедност личности.",
+    "mkd_Cyrl": "Сите човечки суштества се раѓаат слободни и еднакви по достоинство и права. Тие се обдарени со разум и совест и треба да се однесуваат еден кон друг во духот на братството. Секој човек има право на живот, слобода и лична безбедност.",
+    "bel_Cyrl": "Усе людзі нараджаюцца свабоднымі і роўнымі ў сваёй годнасці і правах. Яны надзелены розумам і сумленнем і павінны ставіцца адзін да аднаго ў духу брацтва. Кожны чалавек мае права на жыццё, на свабоду і на асабістую недатыкальнасць.",
+    "arb_Arab": "يولد جميع الناس أحرارًا متساوين في الكرامة والحقوق. وقد وهبوا عقلاً وضميرًا وعليهم أن يعامل بعضهم بعضًا بروح الإخاء. لكل فرد الحق في الحياة والحرية وسلامة شخصه.",
+    "pes_Arab": "تمام افراد بشر آزاد به دنیا می‌آیند و از لحاظ حیثیت و حقوق با هم برابرند. همه دارای عقل و وجدان هستند و باید نسبت به یکدیگر با روح برادری رفتار کنند. هر کس حق زندگی، آزادی و امنیت شخصی دارد.",
+    "urd_Arab": "تمام انسان آزاد اور حقوق و عزت کے اعتبار سے برابر پیدا ہوئے ہیں۔ انہیں ضمیر اور عقل ودیعت ہوئی ہے۔ اس لئے انہیں ایک دوسرے کے ساتھ بھائی چارے کا سلوک کرنا چاہیئے۔ ہر شخص کو اپنی جان، آزادی اور ذاتی تحفظ کا حق ہے۔",
+    "hin_Deva": "सभी मनुष्यों को गौरव और अधिकारों के मामले में जन्मजात स्वतन्त्रता और समानता प्राप्त है। उन्हें बुद्धि और अन्तरात्मा की देन प्राप्त है और परस्पर उन्हें भाईचारे के भाव से बर्ताव करना चाहिए। प्रत्येक व्यक्ति को जीवन, स्वाधीनता और वैयक्तिक सुरक्षा का अधिकार है।",
+    "zho_Hans": "人人生而自由，在尊严和权利上一律平等。他们赋有理性和良心，并应以兄弟关系的精神相对待。人人有权享有生命、自由和人身安全。今天天气很好，我们和朋友一起去市场。",
+    "zho_Hant": "人人生而自由，在尊嚴和權利上一律平等。他們賦有理性和良心，並應以兄弟關係的精神相對待。人人有權享有生命、自由和人身安全。今天天氣很好，我們和朋友一起去市場。",
+}
+
+# Frequent function and interface words, appended to the samples of their language.
+_WORDS = {
+    "eng_Latn": "the of and to a in is it you that he was for on are with as I his they be at one have this from or had by not word but what some we can out other were all there when up use your how said an each she which do their time if will way about many then them write would like so these her long make thing see him two has look more day could go come did number sound no most people my over know water than call first who may down side been now find file please click button save changes could not be opened because does exist error settings",
+    "fra_Latn": "le de un être et à il avoir ne je son que se qui ce dans en du elle au pour pas que vous par sur faire plus dire me on mon lui nous comme mais pouvoir avec tout y aller voir en bien où sans tu ou leur homme si deux mari moi vouloir te femme venir quand grand celui si notre devoir là jour prendre même votre rien petit encore aussi quelque dont tout mer trouver donner temps ça peu même fichier veuillez cliquer sur le bouton enregistrer modifications impossible ouvrir erreur paramètres n'a pas pu",
+    "deu_Latn": "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war haben nur oder aber vor zur bis mehr durch man sein wurde sei ihr bitte klicken Sie auf die Schaltfläche um Ihre Änderungen zu speichern Datei konnte nicht geöffnet werden weil sie nicht existiert Fehler Einstellungen",
+    "spa_Latn": "de la que el en y a los se del las un por con no una su para es al lo como más o pero sus le ha me si sin sobre este ya entre cuando todo esta ser son dos también fue había era muy años hasta desde está mi porque qué sólo han yo hay vez puede todos así nos ni parte tiene él uno donde bien tiempo mismo ese ahora cada haga clic en el botón para guardar los cambios no se pudo abrir el archivo porque no existe error configuración",
+    "ita_Latn": "di e il la che è per un in non a una sono del le si da con della i gli mi ti ci ma come anche questo più se lo al nel alla ho hai ha abbiamo avete hanno essere fare questa quello molto tutto dove quando perché cosa sempre già ancora ora qui fare clic sul pulsante per salvare le modifiche impossibile aprire il file perché non esiste errore impostazioni",
+    "por_Latn": "de a o que e do da em um para é com não uma os no se na por mais as dos como mas foi ao ele das tem à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso ela entre era depois sem mesmo aos ter seus quem nas me esse eles estão você tinha foram essa num nem suas meu às minha têm numa pelos elas clique no botão para salvar as suas alterações não foi possível abrir o arquivo porque ele não existe erro configurações",
+    "cat_Latn": "de la i el que a en els les un per amb no una es del al com més però o ha són hi també quan molt tot aquest aquesta pot fer seu seva jo ell ella nosaltres vosaltres ells feu clic al botó per desar els canvis no s'ha pogut obrir el fitxer perquè no existeix error configuració",
+    "ron_Latn": "și în de la a nu cu să se pe din ce care este un o pentru mai sunt fi au dar ca sau acest această prin după până fost are am foarte când unde cum doar tot toate lor lui ei el ea noi voi faceți clic pe butonul pentru a salva modificările fișierul nu a putut fi deschis deoarece nu există eroare setări",
+    "nld_Latn": "de het een van en in is dat op te zijn die niet met voor er als aan maar ook om je ik bij door was of naar dan nog wel kan uit zo worden wat deze hij zij wij u hebben heeft werd klik op de knop om uw wijzigingen op te slaan het bestand kon niet worden geopend omdat het niet bestaat fout instellingen",
+    "swe_Latn": "och i att det som en på är av för med till den har de inte om ett han var men jag sig från vi så kan man när år säga hon under också efter eller nu sin där vid mot ska skulle kunna klicka på knappen för att spara dina ändringar filen kunde inte öppnas eftersom den inte finns fel inställningar",
+    "dan_Latn": "og i at det en til er som på de med han af for ikke der var mig sig men et har om vi min havde ham hun nu over da fra du ud sin dem os op man hans hvor eller hvad skal selv her alle vil blev kunne klik på knappen for at gemme dine ændringer filen kunne ikke åbnes fordi den ikke findes fejl indstillinger",
+    "nob_Latn": "og i det er som en på til av at for med har ikke de om var jeg et men fra han seg vi kan vil skal så hun nå etter dette eller også ble hadde sin kunne være alle mot klikk på knappen for å lagre endringene filen kunne ikke åpnes fordi den ikke finnes feil innstillinger",
+    "fin_Latn": "ja on ei se että hän oli ovat mutta kun niin kuin myös tai jos nyt vain jo sitä tämä hänen minä sinä me te he olla voi pitää tehdä mukaan kanssa sekä joka mikä napsauta painiketta tallentaaksesi muutokset tiedostoa ei voitu avata koska sitä ei ole olemassa virhe asetukset",
+    "pol_Latn": "i w nie na się z że do to jest jak o a po co tak ale jego od za być który już tylko czy przez może jej są by go mnie ich ja ty my wy oni kliknij przycisk aby zapisać zmiany nie można otworzyć pliku ponieważ nie istnieje błąd ustawienia",
+    "ces_Latn": "a v se na je že to s z do o jako ale by jsem jsou jeho pro tak po byl nebo už jen když od co ve za jak který této tento být mít klikněte na tlačítko pro uložení změn soubor nelze otevřít protože neexistuje chyba nastavení",
+    "hun_Latn": "a az és hogy nem is egy van meg de ez már csak volt mint még el ki be fel le kell lesz lehet vagy mert majd minden sem után között kattintson a gombra a módosítások mentéséhez a fájlt nem sikerült megnyitni mert nem létezik hiba beállítások",
+    "tur_Latn": "ve bir bu da de için ile ne çok daha ama gibi kadar olan olarak en sonra var yok her şey ben sen o biz siz onlar değil mi ki değişikliklerinizi kaydetmek için düğmeye tıklayın dosya mevcut olmadığı için açılamadı hata ayarlar",
+    "ind_Latn": "yang dan di ini itu dengan untuk tidak dari dalam akan pada juga ke karena ada bisa saya kami kita mereka anda sudah atau oleh harus seperti lebih klik tombol untuk menyimpan perubahan anda berkas tidak dapat dibuka karena tidak ada kesalahan pengaturan",
+    "rus_Cyrl": "и в не на я быть он с что а по это она этот к но они мы как из у который то за свой что весь год от так о для ты же все тот мочь вы человек такой его сказать только или ещё бы себя один как уже до время если сам когда другой вот говорить наш мой знать стать при чтобы нажмите кнопку чтобы сохранить изменения не удалось открыть файл так как он не существует ошибка настройки",
+    "ukr_Cyrl": "і в не на я бути він з що а по це вона цей до але вони ми як із у який то за свій що весь рік від так про для ти же всі той могти ви людина такий його сказати тільки або ще би себе один вже коли інший ось говорити наш мій знати стати при щоб натисніть кнопку щоб зберегти зміни не вдалося відкрити файл оскільки він не існує помилка налаштування",
+    "bul_Cyrl": "и в не на аз съм той с че а по това тя този към но те ние как от у който то за свой всички година така за ти също могат вие човек такъв неговия каза само или още би себе си един вече когато друг ето наш мой знае да натиснете бутона за да запазите промените файлът не можа да бъде отворен защото не съществува грешка настройки",
+}
+
+_PREFIXES = sorted({prefix for prefixes in SCRIPTS.values() for prefix in prefixes}, key=len, reverse=True)
+
+@lru_cache(maxsize=None)
+def _letter_script(char):
+    """Return the script name prefix (e.g. LATIN, CJK) of a letter"""
+    name = unicodedata.name(char, "")
+    for prefix in _PREFIXES:
+        if name.startswith(prefix):
+            return prefix
+    return None
+
+def default_samples():
+    """Get the built-in training samples of the identifier"""
+    return {code: f"{sample} {_WORDS.get(code, '')}" for code, sample in _SAMPLES.items()}
+
+def load_samples(directory):
+    """Read training samples from <language code>.txt files of a directory"""
+    samples = {}
+    for path in utils.glob_files_from_dir(directory, suffix=".txt"):
+        code = Path(path).name[:-len(".txt")]
+        samples[code] = " ".join(utils.read_txt(path))
+    return samples
+
+def _languages_by_script(languages):
+    by_script = defaultdict(list)
+    for code in languages:
+        for prefix in SCRIPTS.get(code.split("_")[-1], ()):
+            by_script[prefix].append(code)
+    return by_script
+
+class LanguageIdentifier:
+    """Offline language identifier for NLLB language codes.
+
+    Scripts used by a single NLLB language identify it directly, otherwise a naive Bayes
+    classifier over character 1-3 grams decides between the profiled languages of the script.
+    Texts the best profile hardly explains (min_log_likelihood, per n-gram above the score
+    of unseen n-grams) or explains barely better than the runner-up (min_margin, per n-gram)
+    are left unidentified, they are most likely written in a language without a profile.
+    """
+
+    def __init__(self, samples=None, ngram=3, min_letters=12, alpha=0.05, min_log_likelihood=2.5, min_margin=0.05) -> None:
+        self.ngram = ngram
+        self.min_letters = min_letters
+        self.alpha = alpha
+        self.min_log_likelihood = min_log_likelihood
+        self.min_margin = min_margin
+        self.scripts = _languages_by_script(get_nllb_lang())
+        self.fit(samples or default_samples())
+
+    def _ngrams(self, text):
+        text = f" {' '.join(text.lower().split())} "
+        return [text[i:i + n] for n in range(1, self.ngram + 1) for i in range(len(text) - n + 1)]
+
+    def fit(self, samples):
+        """Train the n-gram profiles from a {language code: text} mapping"""
+        self.languages = list(samples)
+        counts = [Counter(self._ngrams(samples[code])) for code in self.languages]
+        vocabulary = set().union(*counts)
+        totals = np.array([sum(c.values()) for c in counts], dtype=np.float64) + self.alpha * (len(vocabulary) + 1)
+        self._unseen = np.log(self.alpha / totals)
+        self._log_probs = {g: np.log(np.array([c.get(g, 0) + self.alpha for c in counts]) / totals) for g in vocabulary}
+        self.profiled = _languages_by_script(self.languages)
+        return self
+
+    def supports(self, language):
+        """Tell whether a language can be identified"""
+        return language in self.languages or any(self.scripts[prefix] == [language] for prefix in SCRIPTS.get(language.split("_")[-1], ()))
+
+    def detect(self, text):
+        """Identify the language of a text, returns (language code, probability) or (None, 0.0)"""
+        scripts = Counter(_letter_script(c) for c in text if c.isalpha())
+        letters = sum(scripts.values())
+        if letters < self.min_letters:
+            return None, 0.0
+        for prefix, count in scripts.most_common():
+            if prefix is not None and len(self.scripts[prefix]) == 1 and count >= 0.2 * letters:
+                return self.scripts[prefix][0], 1.0
+        script = scripts.most_common(1)[0][0]
+        candidates = [self.languages.index(code) for code in self.profiled.get(script, ())]
+        if not candidates:
+            return None, 0.0
+        grams = self._ngrams(text)
+        scores = np.sum([self._log_probs.get(gram, self._unseen) for gram in grams], axis=0)[candidates]
+        order = np.argsort(scores)[::-1]
+        best = int(order[0])
+        # The softmax below only compares profiled languages, reject texts none of them fits
+        if scores[best] / len(grams) - self._unseen[candidates[best]] < self.min_log_likelihood:
+            return None, 0.0
+        if len(order) > 1 and (scores[best] - scores[order[1]]) / len(grams) < self.min_margin:
+            return None, 0.0
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        return self.languages[candidates[best]], float(probabilities[best])
+
+    def is_language(self, text, language, threshold=0.9):
+        """Tell whether a text is confidently identified as written in the given language"""
+        code, probability = self.detect(text)
+        return code == language and probability >= threshold
+
+def benchmark(texts, translator=None, repeat=3):
+    """Measure the identification cost per line, compared to the translation cost if a translator is given"""
+    identifier = LanguageIdentifier()
+    _t = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            identifier.detect(text)
+    results = {'langid_us_per_line': 1e6 * (time.perf_counter() - _t) / (repeat * len(texts))}
+    if translator is not None:
+        _t = time.perf_counter()
+        translator.translate(texts)
+        results['translate_us_per_line'] = 1e6 * (time.perf_counter() - _t) / len(texts)
+        results['speedup'] = results['translate_us_per_line'] / results['langid_us_per_line']
+    return results
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmark the language identifier against a translation model.")
+    parser.add_argument('-m', '--model_id', help="HuggingFace model ID to compare with.")
+    parser.add_argument('-t', '--target', default="fra_Latn", help="Target language of the model.")
+    args = parser.parse_args()
+    texts = [sentence.strip() for sample in _SAMPLES.values() for sentence in sample.replace("。", ".").split(".") if sentence.strip()]
+    translator = None
+    if args.model_id:
+        from translator import Translator
+        translator = Translator("eng_Latn", args.target, model_id=args.model_id)
+    identifier = LanguageIdentifier()
+    # Accuracy is measured on the training samples, it only checks the profiles are sound
+    accuracy = np.mean([identifier.detect(sentence)[0] == code for code, sample in _SAMPLES.items() for sentence in sample.split(". ") if len(sentence) > 20])
+    print(f"Self accuracy on sample sentences: {accuracy:.2%}")
+    for key, value in benchmark(texts, translator).items():
+        print(f"{key}: {value:.2f}")
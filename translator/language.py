@@ -1,7 +1,12 @@
 import os
+import re
+import logging
+
 from langcodes import closest_supported_match
 from langcodes.tag_parser import LanguageTagError
 
+logger = logging.getLogger(__name__)
+
 _LANGS = [ 
         "ace_Arab", "ace_Latn", "acm_Arab", "acq_Arab", "aeb_Arab", "afr_Latn", "ajp_Arab", "aka_Latn", "amh_Ethi", "apc_Arab", "arb_Arab",
         "ars_Arab", "ary_Arab", "arz_Arab", "asm_Beng", "ast_Latn", "awa_Deva", "ayr_Latn", "azb_Arab", "azj_Latn", "bak_Cyrl", "bam_Latn",
@@ -24,15 +29,224 @@ _LANGS = [
         "yue_Hant", "zho_Hans", "zho_Hant", "zul_Latn"
     ]
 
+# Common short codes of NLLB languages, used by PO files and their directories.
+SHORT_CODES = {
+    'en': 'eng_Latn',
+    'fr': 'fra_Latn',
+    'es': 'spa_Latn',
+    'de': 'deu_Latn',
+    'it': 'ita_Latn',
+    'pt': 'por_Latn',
+    'ru': 'rus_Cyrl',
+    'ja': 'jpn_Jpan',
+    'ko': 'kor_Hang',
+    'zh': 'zho_Hans',
+    'ar': 'arb_Arab',
+    'hi': 'hin_Deva',
+    'bn': 'ben_Beng',
+    'tr': 'tur_Latn',
+    'nl': 'nld_Latn',
+    'sv': 'swe_Latn',
+    'da': 'dan_Latn',
+    'no': 'nob_Latn',
+    'fi': 'fin_Latn',
+    'pl': 'pol_Latn',
+    'cs': 'ces_Latn',
+    'hu': 'hun_Latn',
+    'ro': 'ron_Latn',
+    'uk': 'ukr_Cyrl',
+    'bg': 'bul_Cyrl',
+    'hr': 'hrv_Latn',
+    'sk': 'slk_Latn',
+    'sl': 'slv_Latn',
+    'et': 'est_Latn',
+    'lv': 'lvs_Latn',
+    'lt': 'lit_Latn',
+    'mt': 'mlt_Latn',
+    'el': 'ell_Grek',
+    'cy': 'cym_Latn',
+    'ga': 'gle_Latn',
+    'eu': 'eus_Latn',
+    'ca': 'cat_Latn',
+    'gl': 'glg_Latn',
+    'is': 'isl_Latn',
+    'mk': 'mkd_Cyrl',
+    'sq': 'als_Latn',
+    'be': 'bel_Cyrl',
+    'ka': 'kat_Geor',
+    'hy': 'hye_Armn',
+    'az': 'azj_Latn',
+    'kk': 'kaz_Cyrl',
+    'ky': 'kir_Cyrl',
+    'uz': 'uzn_Latn',
+    'tk': 'tuk_Latn',
+    'mn': 'khk_Cyrl',
+    'th': 'tha_Thai',
+    'vi': 'vie_Latn',
+    'id': 'ind_Latn',
+    'ms': 'zsm_Latn',
+    'tl': 'tgl_Latn',
+    'my': 'mya_Mymr',
+    'km': 'khm_Khmr',
+    'lo': 'lao_Laoo',
+    'am': 'amh_Ethi',
+    'ti': 'tir_Ethi',
+    'or': 'ory_Orya',
+    'as': 'asm_Beng',
+    'ur': 'urd_Arab',
+    'fa': 'pes_Arab',
+    'ps': 'pbt_Arab',
+    'sd': 'snd_Arab',
+    'ne': 'npi_Deva',
+    'si': 'sin_Sinh',
+    'ta': 'tam_Taml',
+    'te': 'tel_Telu',
+    'kn': 'kan_Knda',
+    'ml': 'mal_Mlym',
+    'gu': 'guj_Gujr',
+    'pa': 'pan_Guru',
+    'mr': 'mar_Deva',
+    'sa': 'san_Deva',
+    'sw': 'swh_Latn',
+    'yo': 'yor_Latn',
+    'ig': 'ibo_Latn',
+    'ha': 'hau_Latn',
+    'zu': 'zul_Latn',
+    'xh': 'xho_Latn',
+    'af': 'afr_Latn',
+    'he': 'heb_Hebr',
+    'yi': 'ydd_Hebr',
+}
+
+NLLB_TO_SHORT = {v: k for k, v in SHORT_CODES.items()}
+
+# Unicode character name prefixes of the letters written in each NLLB script.
+SCRIPTS = {
+    "Latn": ("LATIN",),
+    "Cyrl": ("CYRILLIC",),
+    "Arab": ("ARABIC",),
+    "Grek": ("GREEK",),
+    "Hebr": ("HEBREW",),
+    "Armn": ("ARMENIAN",),
+    "Geor": ("GEORGIAN",),
+    "Deva": ("DEVANAGARI",),
+    "Beng": ("BENGALI",),
+    "Guru": ("GURMUKHI",),
+    "Gujr": ("GUJARATI",),
+    "Orya": ("ORIYA",),
+    "Taml": ("TAMIL",),
+    "Telu": ("TELUGU",),
+    "Knda": ("KANNADA",),
+    "Mlym": ("MALAYALAM",),
+    "Sinh": ("SINHALA",),
+    "Olck": ("OL CHIKI",),
+    "Thai": ("THAI",),
+    "Laoo": ("LAO",),
+    "Khmr": ("KHMER",),
+    "Mymr": ("MYANMAR",),
+    "Tibt": ("TIBETAN",),
+    "Ethi": ("ETHIOPIC",),
+    "Tfng": ("TIFINAGH",),
+    "Hang": ("HANGUL", "CJK"),
+    "Hans": ("CJK",),
+    "Hant": ("CJK",),
+    "Jpan": ("HIRAGANA", "KATAKANA", "CJK"),
+}
+
+# Language tokens of NLLB (eng_Latn), mBART-50 (en_XX) and M2M100 (__en__) tokenizers.
+_LANGUAGE_TOKENS = re.compile(r"^(?:([a-z]{3}_[A-Z][a-z]{3})|([a-z]{2}_[A-Z]{2})|__([a-z]{2,3})__)$")
+
+# Models known to translate the NLLB languages, their registry is built without loading a tokenizer.
+NLLB_MODELS = ("facebook/nllb-200",)
+
+def language_codes(tokenizer):
+    """Get the language codes a tokenizer has language tokens for, in vocabulary order"""
+    if getattr(tokenizer, "lang_code_to_token", None):
+        return list(tokenizer.lang_code_to_token)
+    codes = []
+    for token in getattr(tokenizer, "additional_special_tokens", None) or []:
+        match = _LANGUAGE_TOKENS.match(str(token))
+        if match:
+            codes.append(next(group for group in match.groups() if group))
+    return list(dict.fromkeys(codes))
+
+class LanguageRegistry:
+    """Language codes a model translates between, indexed to resolve language tags and short codes to them.
+
+    Membership and short code lookups are dictionary lookups, fuzzy matches of other
+    tags are computed once per tag and memoized.
+    """
+
+    def __init__(self, codes, name=None) -> None:
+        self.name = name
+        self.codes = list(codes)
+        self._index = {code: i for i, code in enumerate(self.codes)}
+        # Short codes (e.g. of PO files and their directories) both ways: fr <-> fra_Latn, fr_XX or fr
+        self._to_short = {code: NLLB_TO_SHORT.get(code, code.split('_')[0]) for code in self.codes}
+        self._from_short = {short: code for short, code in SHORT_CODES.items() if code in self._index}
+        for code, short in self._to_short.items():
+            self._from_short.setdefault(short, code)
+        self._resolved = {}
+
+    def __contains__(self, code):
+        return code in self._index
+
+    def __iter__(self):
+        return iter(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def resolve(self, lang):
+        """Get the code closest to a language tag (None without a match, the tag itself if it cannot be parsed)"""
+        if lang in self._index:
+            return lang
+        if lang not in self._resolved:
+            try:
+                # A model without language tokens takes the tag as is
+                self._resolved[lang] = closest_supported_match(lang, self.codes) if self.codes else lang
+            except LanguageTagError:
+                self._resolved[lang] = lang
+        return self._resolved[lang]
+
+    def normalize(self, code):
+        """Convert a short language code to the code of the model, other codes are returned as is"""
+        if not code:
+            return code
+        return self._from_short.get(code.lower(), code)
+
+    def short_code(self, code):
+        """Convert a code of the model to its short code"""
+        return self._to_short.get(code) or (code.split('_')[0] if '_' in code else code)
+
+NLLB = LanguageRegistry(_LANGS, "nllb-200")
+
+_REGISTRIES = {}
+
+def registry_for(model_id=None, tokenizer=None, offline=False):
+    """Get the language registry of a model, built once from the language tokens of its tokenizer.
+
+    NLLB models use the built-in list, other models have their tokenizer loaded when none is given.
+    """
+    if not model_id or str(model_id).startswith(NLLB_MODELS):
+        return NLLB
+    model_id = str(model_id)
+    if model_id not in _REGISTRIES:
+        if tokenizer is None:
+            from transformers import AutoTokenizer
+            from translator.loading import resolve_model
+            path = resolve_model(model_id, offline=offline)
+            tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=path != model_id)
+        _REGISTRIES[model_id] = LanguageRegistry(language_codes(tokenizer), model_id)
+        logger.debug(f"{model_id} has {len(_REGISTRIES[model_id])} language(s).")
+    return _REGISTRIES[model_id]
+
 def get_nllb_lang(lang = None):
     if not lang:
         return _LANGS
     else:
-        try:
-            return closest_supported_match(lang, _LANGS)
-        except LanguageTagError as lte:
-            return lang
+        return NLLB.resolve(lang)
 
-def get_sys_lang_format():
+def get_sys_lang_format(registry=NLLB):
     i18n = os.environ.get('LANG', "en_EN.UTF-8").split(".")[0]
-    return get_nllb_lang(i18n)
+    return registry.resolve(i18n)
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from pathlib import Path
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+from translator import utils
+from translator.metrics import rss_mb
+
+logger = logging.getLogger(__name__)
+
+# Files needed to load a model, tokenizer and generation settings, without duplicate weight formats
+SNAPSHOT_PATTERNS = ["*.json", "*.model", "*.safetensors", "*.txt", "*.spm", "*.tiktoken"]
+FALLBACK_PATTERNS = ["*.bin"]
+
+def _pin_path(model_id):
+    return utils.get_cache_dir("snapshots") / f"{str(model_id).strip('/').replace('/', '--')}.json"
+
+def pinned_snapshot(model_id):
+    """Get the local snapshot directory pinned for a model, None if there is none (or it was removed)"""
+    path = _pin_path(model_id)
+    if not path.is_file():
+        return None
+    with open(path, 'r') as f:
+        pin = json.load(f)
+    return pin['path'] if Path(pin['path']).is_dir() else None
+
+def pin_snapshot(model_id, revision=None, offline=False):
+    """Download (or find, when offline) a snapshot of a model and pin it for later loads, returns its directory"""
+    from huggingface_hub import snapshot_download
+    kwargs = dict(revision=revision, local_files_only=offline)
+    path = snapshot_download(model_id, allow_patterns=SNAPSHOT_PATTERNS, **kwargs)
+    if not any(Path(path).glob("*.safetensors")):
+        # Older checkpoints only ship PyTorch weights
+        path = snapshot_download(model_id, allow_patterns=SNAPSHOT_PATTERNS + FALLBACK_PATTERNS, **kwargs)
+    pin = _pin_path(model_id)
+    pin.parent.mkdir(parents=True, exist_ok=True)
+    with open(pin, 'w') as f:
+        json.dump({'model_id': str(model_id), 'revision': revision, 'path': str(path)}, f, indent=2)
+    logger.debug(f"Pinned {model_id} to {path}.")
+    return str(path)
+
+def resolve_model(model_id, pin=False, offline=False, revision=None):
+    """Get what to load a model from: a local directory, its pinned snapshot or the hub id.
+
+    A pinned snapshot is loaded straight from disk without asking the hub for updates.
+    """
+    if os.path.isdir(str(model_id)):
+        return str(model_id)
+    if not pin:
+        pinned = pinned_snapshot(model_id)
+        if pinned:
+            return pinned
+    if pin or offline:
+        try:
+            return pin_snapshot(model_id, revision=revision, offline=offline and not pin)
+        except Exception as exception:
+            if offline:
+                raise NotImplementedError(f"{model_id} is not available offline, run once with --pin_model while online: {exception}")
+            raise
+    return model_id
+
+def has_safetensors(path):
+    """Tell whether a local model directory holds safetensors weights"""
+    return os.path.isdir(str(path)) and any(Path(path).glob("*.safetensors"))
+
+def load_model(model_id, max_length=500, pin=False, offline=False):
+    """Load the tokenizer and weights of a model, returns them with the path they came from and the time and RSS each took"""
+    # A pinned local snapshot skips hub resolution, offline never reaches the hub
+    model_path = resolve_model(model_id, pin=pin, offline=offline)
+    local = model_path != model_id
+    report = {}
+    logger.debug("Loading tokenizer...")
+    _t, _m = time.perf_counter(), rss_mb()
+    tokenizer = AutoTokenizer.from_pretrained(model_path, model_max_length=max_length, local_files_only=local)
+    report['tokenizer'] = {'seconds': time.perf_counter() - _t, 'rss_mb': rss_mb() - _m}
+    logger.debug(f"Loading model{' (memory-mapped safetensors)' if has_safetensors(model_path) else ''}...")
+    _t, _m = time.perf_counter(), rss_mb()
+    # Weights are loaded straight into the model instead of a randomly initialized copy
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_path, max_length=max_length, low_cpu_mem_usage=True, local_files_only=local)
+    report['weights'] = {'seconds': time.perf_counter() - _t, 'rss_mb': rss_mb() - _m}
+    return model, tokenizer, model_path, report
+
+class ModelPreloader:
+    """Load a model and its tokenizer in a background thread, e.g. while the user answers prompts"""
+
+    def __init__(self, model_id, max_length=500, pin=False, offline=False) -> None:
+        self.model_id = model_id
+        self.max_length = max_length
+        self._args = (model_id, max_length, pin, offline)
+        self._result = None
+        self._exception = None
+        self._thread = threading.Thread(target=self._load, name="preload", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        try:
+            self._result = load_model(*self._args)
+        except BaseException as exception:
+            self._exception = exception
+
+    def matches(self, model_id, max_length):
+        """Tell whether the preloaded model is the one asked for"""
+        return (self.model_id, self.max_length) == (model_id, max_length)
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        """Wait for the model, re-raising what made loading fail"""
+        self._thread.join()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
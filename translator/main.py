@@ -1,4 +1,5 @@
-import os, sys, psutil, time
+import os, sys, time
+import atexit
 import locale
 import shutil
 import torch
@@ -7,14 +8,22 @@ import questionary
 
 from multiprocess import set_start_method
 from datetime import timedelta
+from itertools import islice
 from pathlib import Path
-from argparse import ArgumentParser
-from datasets import load_dataset, Dataset
+from argparse import ArgumentParser, ArgumentTypeError
+from datasets import load_dataset, concatenate_datasets, Dataset
+from datasets.table import InMemoryTable
 from halo import Halo
 import pyarrow as pa
 import pyarrow.compute as compute
-from translator import Translator, utils, __version__
-from translator.language import get_nllb_lang, get_sys_lang_format
+from translator import Translator, utils, columnar, __version__
+from translator.autotune import autotune
+from translator.loading import ModelPreloader
+from translator.shard import parse_shard, select_shard, shard_paths, merge_shards
+from translator.jobs import JobQueue
+from translator.tree import TreeTranslator, find_text_files, mirror_path
+from translator.records import FORMATS as RECORD_FORMATS, parse_fields, glob_record_files, read_records, translate_records, RecordWriter, TranslationCache
+from translator.language import NLLB, get_sys_lang_format, registry_for
 
 logging.getLogger('transformers.pipelines.base').setLevel(logging.ERROR)
 logger = logging.Logger(__file__)
@@ -39,6 +48,12 @@ please_wait_disclamer = """
 """
 please_wait_short = "Please be patient."
 
+def shard_argument(value):
+    try:
+        return parse_shard(value)
+    except ValueError as exception:
+        raise ArgumentTypeError(str(exception))
+
 def parse_arguments():
     argument_parse = ArgumentParser(description="Translate [FROM one language] [TO another], [any SENTENCE you would like].")
     argument_parse.add_argument('-v', '--version', action='store_true', help="shows the current version of translator")
@@ -47,6 +62,10 @@ def parse_arguments():
     argument_parse.add_argument('sentences', nargs="*", default=[], help="Sentences to translate.")
     argument_parse.add_argument('-d', '--directory', type=str, help="Path to directory to translate in batch instead of unique sentence.")
     argument_parse.add_argument('--po', action='store_true', help="Translate PO (Portable Object) files instead of text files.")
+    argument_parse.add_argument('--stream', action='store_true', help="Print translations of typed or given sentences word by word as they are generated (implies --greedy unless -B is given).")
+    argument_parse.add_argument('--recursive', action='store_true', help="Translate the text files of the directory and its subdirectories into the same tree under --save (a directory), one output file per input file.")
+    argument_parse.add_argument('--format', default="txt", choices=("txt",) + RECORD_FORMATS, help="Format of the files of directory mode, jsonl and csv records get the translation of each --field added.")
+    argument_parse.add_argument('--field', type=str, help="Comma separated fields of the records to translate (e.g. title,body).")
     argument_parse.add_argument('--force', action='store_true', help="Force translation ignoring cache (text files) or translate all entries including translated ones (PO files).")
     argument_parse.add_argument('-S', '--save', type=str, help="Path to text file to save translations.")
     argument_parse.add_argument('-l', '--max_length', default=max_translation_lenght, type=int, help="Max length of output.")
@@ -55,15 +74,139 @@ def parse_arguments():
     argument_parse.add_argument('-b', '--batch_size', default=128, type=int, help="Number of sentences to batch for translation.")
     argument_parse.add_argument('-n', '--nproc', default=4, type=int, help="Number of process(es) to spawn for batch translation.")
     argument_parse.add_argument('-e', '--nepoch', default=1, type=int, help="Number of epoch(s) to translate batched sentences.")
+    argument_parse.add_argument('--shortlist', action='store_true', help="Restrict the decoder output to tokens written in the script of the target language.")
+    argument_parse.add_argument('--shortlist_corpus', type=str, help="Text file or directory in the target language used to build the vocabulary shortlist.")
+    argument_parse.add_argument('-B', '--num_beams', type=int, help="Number of beams for beam search (1 means greedy decoding).")
+    argument_parse.add_argument('--greedy', action='store_true', help="Use cheap greedy decoding (same as --num_beams 1).")
+    argument_parse.add_argument('--early_stopping', action='store_true', default=None, help="Stop beam search as soon as enough finished candidates are found.")
+    argument_parse.add_argument('--length_ratio', type=float, help="Cap the output of each batch to LENGTH_RATIO x input tokens + LENGTH_OFFSET (e.g. 1.5).")
+    argument_parse.add_argument('--length_offset', default=10, type=int, help="Number of tokens added to the relative output cap.")
+    argument_parse.add_argument('--segment', type=int, metavar='TOKENS', help="Split inputs longer than TOKENS tokens into sentences translated separately and joined back.")
+    argument_parse.add_argument('--prefilter', action='store_true', help="Pass empty lines, numbers, URLs, e-mail addresses, placeholders and code through untranslated.")
+    argument_parse.add_argument('--templates', action='store_true', help="Mask numbers, IDs, URLs and placeholders so sentences differing only by such values are translated once.")
+    argument_parse.add_argument('--memory', type=float, metavar='THRESHOLD', help="Index translated sentences and match near-duplicates above THRESHOLD similarity (0-1, e.g. 0.9).")
+    argument_parse.add_argument('--memory_mode', default="reuse", choices=["reuse", "flag"], help="Reuse the translation of near-duplicates or only flag them. Reused translations are taken as is, numbers and names are not updated (\"Order 1235 shipped\" gets the translation of \"Order 1234 shipped\"), see --templates for that.")
+    argument_parse.add_argument('--memory_size', default=100000, type=int, help="Number of sentences the translation memory keeps indexed, the least recently matched ones are dropped first.")
+    argument_parse.add_argument('--langid', action='store_true', help="Identify the language of each line offline and skip the ones already in the target language.")
+    argument_parse.add_argument('--langid_samples', type=str, help="Directory of <language code>.txt files to train the language identifier with (implies --langid).")
+    argument_parse.add_argument('--metrics', type=str, metavar='PATH', help="Write a JSON summary of per-stage timings, token counts and memory use of the run to PATH.")
+    argument_parse.add_argument('--prometheus', type=str, metavar='PATH', help="Write the run metrics to PATH in Prometheus text format.")
+    argument_parse.add_argument('--backend', default="transformers", choices=["transformers", "null"], help="Model backend, null reverses each input at no cost to measure everything but the model.")
+    argument_parse.add_argument('--profile', type=str, metavar='PATH', help="Profile the whole run and dump the profile to PATH.")
+    argument_parse.add_argument('--profiler', default="cprofile", choices=["cprofile", "pyinstrument"], help="Profiler used by --profile (cProfile stats or pyinstrument HTML).")
+    argument_parse.add_argument('--shard', type=shard_argument, metavar='i/N', help="Only translate the unique sentences of shard i out of N (stable hash), numbered from 1 (1/4 to 4/4); combine shards with 'translate merge FROM TO -S PATH'.")
+    argument_parse.add_argument('--job_queue', action='store_true', help="Share the work of directory mode with other translate processes (on any host) saving to the same path, through a job queue in its cache directory.")
+    argument_parse.add_argument('--job_chunk_size', default=1000, type=int, help="Number of sentences per chunk of the --job_queue, the unit processes take, lease and retake.")
+    argument_parse.add_argument('--chunk_size', default=1000, type=int, help="Number of records read at once with --format jsonl|csv, or of distinct lines translated at once with --recursive.")
+    argument_parse.add_argument('--lease', default=600, type=float, metavar='SECONDS', help="Seconds without heartbeat after which the chunk of a job queue worker is retaken by others.")
+    argument_parse.add_argument('--pin_model', action='store_true', help="Download a snapshot of the model once and load it from disk in later runs, without asking the hub for updates.")
+    argument_parse.add_argument('--offline', action='store_true', help="Only load the model from a local directory or its pinned snapshot, never from the hub.")
+    argument_parse.add_argument('--draft_model_id', type=str, help="Smaller model sharing the vocabulary of the model, proposing tokens the model verifies (assisted decoding, same output as greedy decoding).")
+    argument_parse.add_argument('--token_cache', action='store_true', help="Tokenize each distinct input once and keep its token ids in the cache directory (memory-mapped Arrow), shared by every target language and resumed run.")
+    argument_parse.add_argument('--max_rss', type=float, metavar='MB', help="Memory budget in MB: batches are halved when the process goes over it or fails to allocate, and grown back once memory allows.")
+    argument_parse.add_argument('--autotune', action='store_true', help="Calibrate batch size, threads and workers on a sample of the input and use the fastest configuration.")
+    argument_parse.add_argument('--autotune_budget', type=float, metavar='MB', help="Memory budget of the calibration in MB (default: --max_rss or 80%% of the available memory).")
+    argument_parse.add_argument('--autotune_sample', default=256, type=int, help="Number of input sentences the calibration runs on.")
+    argument_parse.add_argument('--autotune_cache', action='store_true', help="Store the calibrated configuration per model and host, and reuse it in later runs.")
     argument_parse.add_argument('-L', '--language_list', action='store_true', help="Show list of languages.")
     argument_parse.add_argument('-vv', "--debug", action='store_true', help="Show debug info")
     argument_parse.add_argument('-i', "--interactive", action='store_false', help="Deactivate interactiveness.")
     
     return argument_parse.parse_args(), argument_parse
 
+def translator_options(args):
+    return dict(
+        shortlist=args.shortlist,
+        shortlist_corpus=args.shortlist_corpus,
+        # Beam search cannot stream
+        num_beams=1 if args.greedy or (args.stream and not args.num_beams) else args.num_beams,
+        early_stopping=args.early_stopping,
+        length_ratio=args.length_ratio,
+        length_offset=args.length_offset,
+        segment_length=args.segment,
+        prefilter=args.prefilter,
+        templates=args.templates,
+        memory_threshold=args.memory,
+        memory_mode=args.memory_mode,
+        memory_size=args.memory_size,
+        langid=args.langid,
+        langid_samples=args.langid_samples,
+        backend=args.backend,
+        max_rss=args.max_rss,
+        token_cache=args.token_cache,
+        pin_model=args.pin_model,
+        offline=args.offline,
+        draft_model_id=args.draft_model_id,
+    )
+
+def model_languages(args):
+    """Get the languages of the model, its tokenizer is only read on first use (and never with the null backend)"""
+    if args.backend == "null":
+        return NLLB
+    return registry_for(args.model_id, offline=args.offline)
+
+def export_metrics(metrics, summary_path=None, prometheus_path=None):
+    if summary_path:
+        metrics.save_summary(summary_path)
+    if prometheus_path:
+        metrics.save_prometheus(prometheus_path)
+
+def start_profiler(path, profiler="cprofile"):
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise NotImplementedError("pyinstrument is not installed, run `pip install pyinstrument` or use --profiler cprofile.")
+        profile = Profiler()
+        profile.start()
+
+        def _dump():
+            profile.stop()
+            with open(path, 'w') as f:
+                f.write(profile.output_html())
+    else:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+
+        def _dump():
+            profile.disable()
+            profile.dump_stats(path)
+    atexit.register(_dump)
+
+def _iter_inputs(directory=None, sentences=None, po_mode=False):
+    if directory and po_mode:
+        for po_file_path in sorted(utils.glob_po_files_from_dir(directory)):
+            yield from utils.extract_all_from_po(utils.read_po_file(po_file_path))
+    elif directory:
+        for txt_file in sorted(utils.glob_files_from_dir(directory, suffix=".txt")):
+            with utils.open_text(txt_file, 'r') as f:
+                for line in f:
+                    yield line.rstrip("\n")
+    else:
+        yield from sentences or []
+
+def _distinct(texts):
+    seen = set()
+    for text in texts:
+        if text not in seen:
+            seen.add(text)
+            yield text
+
+def sample_inputs(directory=None, sentences=None, po_mode=False, size=256):
+    """Read the distinct non-empty inputs autotune draws its sample from, stopping at a few times its size"""
+    texts = (text for text in _iter_inputs(directory, sentences, po_mode) if text.strip())
+    # Pool a few times the sample size so the random sample is not just the first lines
+    return list(islice(_distinct(texts), 4 * size))
+
 def translate_sentence(sentence, translator):
     return translator.translate(sentence) or []
 
+def stream_sentence(sentence, translator):
+    translation = "".join(translator.stream(sentence, callback=lambda piece: print(piece, end="", flush=True)))
+    print()
+    return translation
+
 def _log(msg, logger=None, spinner=None, _type="info"):
     if not msg:
         return
@@ -89,7 +232,7 @@ def _log(msg, logger=None, spinner=None, _type="info"):
         print(msg)
     return msg
 
-def print_version(version, prefix="Translator version:", _from="eng_Latn", _to=get_sys_lang_format(), is_interactive=False, spinner=None, logger=None, max_length=max_translation_lenght, model_id=default_translator_model, pipeline=default_translator_pipeline, batch_size=1, nproc=1):
+def print_version(version, prefix="Translator version:", _from="eng_Latn", _to=get_sys_lang_format(), is_interactive=False, spinner=None, logger=None, max_length=max_translation_lenght, model_id=default_translator_model, pipeline=default_translator_pipeline, batch_size=1, nproc=1, options=None):
     v = None
 
     if _to == _from:
@@ -103,7 +246,7 @@ def print_version(version, prefix="Translator version:", _from="eng_Latn", _to=g
                 spinner.start()
                 spinner.text = please_wait_short
 
-            translator = Translator(_from, _to, max_length, model_id, pipeline, batch_size=batch_size, n_proc=nproc)
+            translator = Translator(_from, _to, max_length, model_id, pipeline, batch_size=batch_size, n_proc=nproc, **(options or {}))
             
             if is_interactive and spinner:
                 spinner.text = ""
@@ -126,6 +269,9 @@ def print_version(version, prefix="Translator version:", _from="eng_Latn", _to=g
 def main():
     args, parser = parse_arguments()
 
+    if args.profile:
+        start_profiler(args.profile, args.profiler)
+
     is_interactive = args.interactive
 
     if args.debug:
@@ -162,7 +308,24 @@ def main():
     ]
 
     if args.version or args._from in fetch_version:
-        print_version(__version__, _to="".join(args._to) or get_sys_lang_format(), is_interactive=is_interactive, spinner=spinner, logger=logger, max_length=args.max_length, model_id=args.model_id, pipeline=args.pipeline, batch_size=args.batch_size)
+        print_version(__version__, _to="".join(args._to) or get_sys_lang_format(), is_interactive=is_interactive, spinner=spinner, logger=logger, max_length=args.max_length, model_id=args.model_id, pipeline=args.pipeline, batch_size=args.batch_size, options=translator_options(args))
+        sys.exit(0)
+
+    if args._from == "merge":
+        # translate merge FROM TO -S PATH
+        _merge_from, _merge_to = "".join(args._to), "".join(args.sentences[:1])
+        if not _merge_from or not _merge_to or not args.save:
+            _log("Usage: translate merge FROM TO -S PATH", logger, spinner, 'error')
+            sys.exit(1)
+        try:
+            merged, missing = merge_shards(args.save, _merge_from, _merge_to)
+        except (FileNotFoundError, ValueError) as exception:
+            _log(str(exception), logger, spinner, 'error')
+            sys.exit(1)
+        _log(f"Merged {merged:n} translated sentence(s) for {args.save}.", logger, spinner, 'success')
+        if missing:
+            _log(f"Missing shard(s) {', '.join(map(str, missing))}: their sentences will be translated when resuming.", logger, spinner, 'warning')
+        print(f"Resume with: translate {_merge_from} {_merge_to} -d DIRECTORY -S {args.save}")
         sys.exit(0)
 
     fetch_languages = [
@@ -184,11 +347,12 @@ def main():
     ]
 
     if args.language_list or args._from in fetch_languages:
+        languages = model_languages(args)
+        if not languages:
+            _log(f"{args.model_id} has no language tokens, it translates a fixed language pair.", logger, spinner, 'error')
+            sys.exit(1)
         _log("Language list:", logger, spinner, 'info')
-        if args.model_id == "facebook/nllb-200-distilled-600M":
-            for l in get_nllb_lang(): print(f"- {l}")
-        else:
-            raise NotImplementedError(f"{args.model_id=} language list not implemented.")
+        for l in languages: print(f"- {l}")
         print()
         sys.exit(0)
 
@@ -218,15 +382,19 @@ def main():
     # Normalize language codes (allow short codes like 'fr' to be converted to 'fra_Latn')
     if _po_mode:
         if _from:
-            _from = utils.normalize_language_code(_from)
+            _from = utils.normalize_language_code(_from, model_languages(args))
         if _to:
-            _to = utils.normalize_language_code(_to)
+            _to = utils.normalize_language_code(_to, model_languages(args))
 
     nepoch, nproc, batch_size = args.nepoch, args.nproc, args.batch_size
+    preloader = None
 
     if not _from and not _to and not _sentences and not _directory and is_interactive:
         _log("Welcome!", logger, spinner, 'info')
-        print_version(__version__, prefix="I am Translator version:", _to="".join(args._to) or 'eng_Latn', is_interactive=is_interactive, spinner=spinner, logger=logger, max_length=args.max_length, model_id=args.model_id, pipeline=args.pipeline, batch_size=args.batch_size, nproc=args.nproc)
+        if args.backend == "transformers":
+            # Load the model while the user answers, the language pair is bound once it is known
+            preloader = ModelPreloader(args.model_id, args.max_length, pin=args.pin_model, offline=args.offline)
+        print_version(__version__, prefix="I am Translator version:", _to="".join(args._to) or 'eng_Latn', is_interactive=is_interactive, spinner=spinner, logger=logger, max_length=args.max_length, model_id=args.model_id, pipeline=args.pipeline, batch_size=args.batch_size, nproc=args.nproc, options=translator_options(args))
         _log("At your service.", logger, spinner, 'info')
 
         options = ["Manually typed sentences", "Stored sentences in file(s)", "Nothing, just exit"]
@@ -258,16 +426,17 @@ def main():
             _log("Exiting.", logger, spinner, 'info')
             sys.exit(1)
         
-        _from = get_nllb_lang(source_language)
+        languages = model_languages(args)
+        _from = languages.resolve(source_language)
         _log(f"Translating from {_from}.", logger, spinner, 'info')
         
         # Prompt target language
-        target_language = questionary.text("What language to translate to?", default=get_sys_lang_format()).ask()
+        target_language = questionary.text("What language to translate to?", default=get_sys_lang_format(languages)).ask()
         if not target_language:
             _log("Exiting.", logger, spinner, 'info')
             sys.exit(1)
         
-        _to = get_nllb_lang(target_language)
+        _to = languages.resolve(target_language)
         _log(f"Translating to {_to}.", logger, spinner, 'info')
 
         # Translate prompt loop
@@ -280,7 +449,7 @@ def main():
                     spinner.start()
                     spinner.text = please_wait_short
 
-                translator = Translator(_from, _to, args.max_length, args.model_id, args.pipeline, batch_size=batch_size, n_proc=nproc)
+                translator = Translator(_from, _to, args.max_length, args.model_id, args.pipeline, batch_size=batch_size, n_proc=nproc, preloaded=preloader, **translator_options(args))
                 
                 if is_interactive and spinner:
                     spinner.text = ""
@@ -300,8 +469,11 @@ def main():
                     _log("What would you like to translate?")
                     sentence = questionary.text("Translate:").ask()
                     if sentence:
-                        translation = translate_sentence(sentence, translator)
-                        for t in translation: _log(f"{t}")
+                        if args.stream:
+                            stream_sentence(sentence, translator)
+                        else:
+                            translation = translate_sentence(sentence, translator)
+                            for t in translation: _log(f"{t}")
                         _log(" "*10)
                     else:
                         sys.exit(1)
@@ -332,14 +504,19 @@ def main():
             _save_path = _save.as_posix()
 
         nepoch = int(questionary.text("How many epochs to translate?", default=str(nepoch)).ask()) or nepoch
-        batch_size = int(questionary.text("How many sentences to batch together?", default=str(args.batch_size)).ask()) or batch_size
-        nproc = int(questionary.text("How many processes to spawn for translation?", default=str(nproc)).ask()) or nproc
+        if not args.autotune:
+            args.autotune = questionary.confirm("Calibrate batch size and workers automatically?", default=False).ask()
+        if not args.autotune:
+            batch_size = int(questionary.text("How many sentences to batch together?", default=str(args.batch_size)).ask()) or batch_size
+            nproc = int(questionary.text("How many processes to spawn for translation?", default=str(nproc)).ask()) or nproc
 
 
+    # Language codes of the model, read from its tokenizer once
+    languages = model_languages(args)
     if _from and _to and not _sentences:
-        if _to not in get_nllb_lang() and _to == get_nllb_lang(_to):
+        if languages and _to not in languages and _to == languages.resolve(_to):
             _sentences = [args._to]
-            _to = get_sys_lang_format()
+            _to = get_sys_lang_format(languages)
             _log(f"Target language was not provided. Translating to \'{_to}\'.", logger, spinner, 'info')
         elif not _directory:
             _log(f"Missing sentences to translate.", logger, spinner, 'error')
@@ -352,7 +529,7 @@ def main():
             print("Type \'translate --help\' to get help.")
             sys.exit(1)
         else:
-            _to = get_sys_lang_format()
+            _to = get_sys_lang_format(languages)
             _log(f"Target language was not provided. Translating to \'{_to}\'.", logger, spinner, 'info')
     
     if not _from:
@@ -361,17 +538,17 @@ def main():
         sys.exit(1)
 
     for _lang in [_from, _to]:
-        if _lang not in get_nllb_lang() and args.model_id == "facebook/nllb-200-distilled-600M":
+        if languages and _lang not in languages:
             _log(f"Warning! {_lang} is not listed as supported language by the current model {args.model_id}.", logging, spinner, 'warning')
             print("There is a high probability translation will fail.")
             print("Type translate --language_list to get the full list of supported languages.")
             print("Or type \'translate --help\' to get help.")
-            _nllb_lang = get_nllb_lang(_lang)
+            _model_lang = languages.resolve(_lang)
             if _lang == _from:
-                _from = _nllb_lang
+                _from = _model_lang
             elif _lang == _to:
-                _to = _nllb_lang
-            _log(f"Using {_nllb_lang} instead of {_lang}.", logger, spinner, 'info')
+                _to = _model_lang
+            _log(f"Using {_model_lang} instead of {_lang}.", logger, spinner, 'info')
     
     if _from == _to and not _po_mode:
         _log(f"Warning! {_from=} == {_to=} ", logger, spinner, 'warning')
@@ -386,19 +563,20 @@ def main():
             if not _save_path:
                 txt_files = utils.glob_files_from_dir(_directory, suffix=".txt")
             else:
-                txt_files = list(set(utils.glob_files_from_dir(_directory, suffix=".txt")) - set([_save_path, f"{_directory}/{_save_path}"]) - set(utils.glob_files_from_dir(f"{_save_path.replace('.txt', f'.{_from}.{_to}.tmp.cache')}", suffix="*")))
+                txt_files = list(set(utils.glob_files_from_dir(_directory, suffix=".txt")) - set([_save_path, f"{_directory}/{_save_path}"]) - set(utils.glob_files_from_dir(utils.get_resume_paths(_save_path, _from, _to)[0], suffix="*")))
             if not txt_files:
                 _log(f"No files to translate in \'{args.directory}\'.", logger, spinner, 'error')
                 sys.exit(1)
+            # Inputs and output may be compressed, like in directory mode
             if _save_path:
-                with open(_save_path, 'w') as outfile:
+                with utils.open_text(_save_path, 'w') as outfile:
                     for fname in txt_files:
-                        with open(fname) as infile:
+                        with utils.open_text(fname, 'r') as infile:
                             for line in infile:
                                 outfile.write(line)
             else:
                 for fname in txt_files:
-                    with open(fname) as infile: print(infile.read())
+                    with utils.open_text(fname, 'r') as infile: print(infile.read())
         sys.exit(0)
 
     _log("Preparing to translate...", logger, spinner, 'info')
@@ -407,10 +585,28 @@ def main():
         spinner.start()
         spinner.text = please_wait_short
 
-    translator = Translator(_from, _to, args.max_length, args.model_id, args.pipeline, batch_size=batch_size, n_proc=nproc)
+    translator = Translator(_from, _to, args.max_length, args.model_id, args.pipeline, batch_size=batch_size, n_proc=nproc, preloaded=preloader, **translator_options(args))
+    metrics = translator.metrics
+    if translator.load_report:
+        _log("Loaded " + ", ".join(f"{part} in {report['seconds']:.2f}s (+{report['rss_mb']:.0f} MB)" for part, report in translator.load_report.items()) + f" from {translator.model_path}.", logger, spinner, 'debug')
+
+    if args.autotune:
+        if is_interactive and spinner:
+            spinner.start()
+            spinner.text = "Calibrating..."
+        tuning = autotune(translator, sample_inputs(_directory, _sentences, _po_mode, args.autotune_sample), sample_size=args.autotune_sample, budget=args.autotune_budget or args.max_rss, cache=args.autotune_cache)
+        if is_interactive and spinner: spinner.stop()
+        if tuning:
+            batch_size, nproc = tuning['batch_size'], tuning['num_workers']
+            _log(f"Autotune: batch size {batch_size}, {tuning['threads']} thread(s), {nproc} worker(s) (~{tuning['sentences_per_second']:.2f} sentences / second, {tuning['peak_rss_mb']:.0f} MB).", logger, spinner, 'info')
+        else:
+            _log("Autotune: nothing to calibrate on, keeping the given batch size and workers.", logger, spinner, 'warning')
+    if args.metrics or args.prometheus:
+        atexit.register(export_metrics, metrics, args.metrics, args.prometheus)
 
     translations = []
     _translated = []
+    writer = None
     
     if is_interactive and spinner:
         spinner.text = ""
@@ -427,7 +623,7 @@ def main():
             _log(f"Looking for PO files in target language directories for '{_to}' in directory '{_directory}'.", logger, spinner, 'info')
         else:
             # Multi-language mode: detect all target languages
-            target_languages = utils.detect_target_languages_from_directory(_directory)
+            target_languages = utils.detect_target_languages_from_directory(_directory, languages)
             if not target_languages:
                 _log("No target languages found with Language metadata set in PO files.", logger, spinner, 'error')
                 _log("Set the Language metadata in your PO files to enable auto-translation (e.g., Language: fr).", logger, spinner, 'info')
@@ -443,10 +639,10 @@ def main():
             _log(f"Processing target language: {target_lang}", logger, spinner, 'info')
             
             # Find PO files in target language directories only
-            po_files = utils.glob_po_files_for_target_language(_directory, target_lang)
+            po_files = utils.glob_po_files_for_target_language(_directory, target_lang, languages=languages)
             _l = len(po_files)
             if _l == 0:
-                target_short = utils.nllb_to_short_code(target_lang)
+                target_short = utils.nllb_to_short_code(target_lang, languages)
                 _log(f"No PO files found in target language directories for {target_lang} (e.g., locale/{target_short}/, {target_short}/) in '{_directory}'.", logger, spinner, 'warning')
                 continue
             _log(f"Found {_l} PO file{'s' if _l > 1 else ''} for {target_lang}.", logger, spinner, 'info')
@@ -459,12 +655,13 @@ def main():
                 _log(f"Processing {po_file_path}...", logger, spinner, 'info')
                 
                 # Read PO file
-                po_file = utils.read_po_file(po_file_path)
+                with metrics.time("io"):
+                    po_file = utils.read_po_file(po_file_path)
                 
                 # Check if this PO file should be translated based on language metadata matching target
-                if not utils.should_translate_po_file(po_file, target_lang):
+                if not utils.should_translate_po_file(po_file, target_lang, languages):
                     po_language = utils.get_po_language(po_file)
-                    target_short = utils.nllb_to_short_code(target_lang)
+                    target_short = utils.nllb_to_short_code(target_lang, languages)
                     _log(f"Skipping {po_file_path} - language mismatch (PO language: {po_language or 'none'}, target: {target_short})", logger, spinner, 'info')
                     _log(f"Set Language metadata to '{target_short}' in PO file header to enable translation.", logger, spinner, 'info')
                     skipped_files += 1
@@ -497,7 +694,8 @@ def main():
                 utils.update_po_with_translations(po_file, translation_dict, force=_force)
                 
                 # Save the updated PO file
-                utils.save_po_file(po_file, po_file_path)
+                with metrics.time("io"):
+                    utils.save_po_file(po_file, po_file_path)
                 
                 total_translated += len(translation_dict)
                 total_processed += 1
@@ -523,13 +721,14 @@ def main():
         _log(f"Translating single PO file: {po_file_path}", logger, spinner, 'info')
         
         # Read PO file
-        po_file = utils.read_po_file(po_file_path)
+        with metrics.time("io"):
+            po_file = utils.read_po_file(po_file_path)
         
         # If no target language specified, detect from PO file metadata
         if not _to:
             po_language = utils.get_po_language(po_file)
             if po_language:
-                _to = utils.normalize_language_code(po_language)
+                _to = utils.normalize_language_code(po_language, languages)
                 _log(f"Detected target language from PO file metadata: {_to}", logger, spinner, 'info')
             else:
                 _log(f"Cannot determine target language - no Language metadata in {po_file_path}", logger, spinner, 'error')
@@ -537,9 +736,9 @@ def main():
                 sys.exit(1)
         
         # Check if this PO file should be translated based on language metadata matching target
-        if not utils.should_translate_po_file(po_file, _to):
+        if not utils.should_translate_po_file(po_file, _to, languages):
             po_language = utils.get_po_language(po_file)
-            target_short = utils.nllb_to_short_code(_to)
+            target_short = utils.nllb_to_short_code(_to, languages)
             _log(f"Cannot translate {po_file_path} - language mismatch (PO language: {po_language or 'none'}, target: {target_short})", logger, spinner, 'error')
             _log(f"Set Language metadata to '{target_short}' in PO file header to enable translation.", logger, spinner, 'info')
             sys.exit(1)
@@ -571,11 +770,99 @@ def main():
         utils.update_po_with_translations(po_file, translation_dict, force=_force)
         
         # Save the updated PO file
-        utils.save_po_file(po_file, po_file_path)
+        with metrics.time("io"):
+            utils.save_po_file(po_file, po_file_path)
         
         _log(f"Translation completed! Updated {po_file_path} with {len(translation_dict)} translations.", logger, spinner, 'success')
         sys.exit(0)
 
+    # Handle JSONL/CSV records translation
+    if args.format in RECORD_FORMATS and _directory and Path(_directory).exists():
+        try:
+            fields = parse_fields(args.field)
+        except ValueError as exception:
+            _log(str(exception), logger, spinner, 'error')
+            sys.exit(1)
+        record_files = glob_record_files(_directory, args.format)
+        if not record_files:
+            _log(f"No {args.format} files to translate in \'{_directory}\'.", logger, spinner, 'error')
+            sys.exit(1)
+        if not _save_path:
+            _log(f"Translating records without passing --save argument is forbbiden, pass a .{args.format} file or a directory.", logger, spinner, 'error')
+            sys.exit(1)
+        # All records into one file, or each file under the same name in a directory
+        if _save_path.endswith(f".{args.format}"):
+            outputs = [(_save_path, record_files)]
+        else:
+            outputs = [(os.path.join(_save_path, Path(f).name), [f]) for f in record_files]
+        if any(os.path.abspath(output) == os.path.abspath(f) for output, _ in outputs for f in record_files):
+            _log(f"Refusing to overwrite input files with their translation, choose another --save path than {_save_path}.", logger, spinner, 'error')
+            sys.exit(1)
+        _log(f"Translate fields {', '.join(fields)} of {len(record_files)} {args.format} file(s) from {_from} to {_to} by chunks of {args.chunk_size:n} records.", logger, spinner, 'info')
+
+        time_before = time.perf_counter()
+        cache = TranslationCache()
+        total_records = 0
+        try:
+            for output, inputs in outputs:
+                with RecordWriter(output, args.format) as record_writer:
+                    records = (record for f in inputs for record in read_records(f, args.format))
+                    for record in translate_records(records, fields, lambda texts: translate_sentence(texts, translator), _to, args.chunk_size, cache):
+                        record_writer.write(record)
+                metrics.count("records", record_writer.rows)
+                total_records += record_writer.rows
+                _log(f"Saved {record_writer.rows:n} record(s) under {output}.", logger, spinner, 'success')
+        except (KeyboardInterrupt, ValueError, RuntimeError) as exception:
+            _log(str(exception), logger, spinner, 'error')
+            _log(f"Records written so far are left next to {output} as a .part file.", logger, spinner, 'warning')
+            sys.exit(1)
+        _td = time.perf_counter() - time_before
+        metrics.observe("directory_seconds", _td)
+        _log(f"Translated {total_records:n} record(s) in {timedelta(seconds=_td)}, {cache.hits:n}/{cache.lookups:n} text(s) reused from previous chunks.", logger, spinner, 'success')
+        if translator.failed:
+            _log(f"Kept {len(translator.failed):n} text(s) untranslated after they failed on their own.", logger, spinner, 'warning')
+        sys.exit(0)
+
+    # Handle recursive directory translation into a mirrored tree
+    if args.recursive and _directory and Path(_directory).is_dir():
+        if not _save_path:
+            _log("Translating a directory tree without passing --save argument is forbbiden, pass the output directory.", logger, spinner, 'error')
+            sys.exit(1)
+        if os.path.abspath(_save_path) == os.path.abspath(_directory):
+            _log("Refusing to overwrite input files with their translation, choose another --save directory.", logger, spinner, 'error')
+            sys.exit(1)
+        with metrics.time("io"):
+            tree_inputs = find_text_files(_directory, exclude=_save_path)
+        if not tree_inputs:
+            _log(f"No files to translate under \'{_directory}\'.", logger, spinner, 'error')
+            sys.exit(1)
+        tree_outputs = [mirror_path(f, _directory, _save_path) for f in tree_inputs]
+        _log(f"Translate {len(tree_inputs):n} text file(s) under {_directory} from {_from} to {_to} into {_save_path}.", logger, spinner, 'info')
+
+        def _file_done(source, output, lines):
+            metrics.count("files")
+            update = f"{tree.files:n}/{len(tree_inputs) - tree.skipped:n} file(s) | {source} -> {output} ({lines:n} lines)"
+            _log(update, logger, None, 'debug' if args.debug else 'info')
+            if is_interactive and spinner: spinner.text = update
+
+        time_before = time.perf_counter()
+        tree = TreeTranslator(lambda texts: translate_sentence(texts, translator), chunk_size=args.chunk_size, threads=nproc, force=_force)
+        try:
+            with metrics.time("epoch", track_rss=True):
+                tree.run(tree_inputs, tree_outputs, on_file=_file_done)
+        except (KeyboardInterrupt, RuntimeError) as exception:
+            _log(str(exception), logger, spinner, 'error')
+            _log(f"{tree.files:n} file(s) were written, run the same command again to translate the others.", logger, spinner, 'warning')
+            sys.exit(1)
+        _td = time.perf_counter() - time_before
+        metrics.observe("directory_seconds", _td)
+        if tree.skipped:
+            _log(f"Kept {tree.skipped:n} file(s) translated already, use --force to translate them again.", logger, spinner, 'info')
+        _log(f"Translated {tree.files:n} file(s) ({tree.lines:n} lines, {tree.translated:n} distinct) in {timedelta(seconds=_td)}.", logger, spinner, 'success')
+        if translator.failed:
+            _log(f"Kept {len(translator.failed):n} line(s) untranslated after they failed on their own.", logger, spinner, 'warning')
+        sys.exit(0)
+
     if _directory and Path(_directory).exists():
         _log("No sentence was given but directory was provided.", logger, spinner, 'info')
         _log(f"Translate sentences in {_from} to {_to} from {'PO' if _po_mode else 'text'} files in directory \'{_directory}\' by batches of size {batch_size}.", logger, spinner, 'info')
@@ -586,9 +873,15 @@ def main():
             _log("Type \'!! --save translations.txt\' to append the --save flag to your last command.", logger, spinner, 'info')
             sys.exit(1)
         output_path = _save_path
+        if args.shard:
+            shard_index, shard_count = args.shard
+            output_path, shard_sources_path = shard_paths(_save_path, _from, shard_index, shard_count)
+            _save_path = output_path
+            _log(f"Translating shard {shard_index}/{shard_count} into {output_path}.", logger, spinner, 'info')
         
-        cache = f"{output_path.replace('.txt', f'.{_from}.{_to}.tmp.cache')}"
-        translated_input_path = f"{cache}/{os.path.basename(output_path)}.{_from}.txt"
+        cache, translated_input_path = utils.get_resume_paths(output_path, _from, _to)
+        columnar_output = columnar.is_columnar(output_path)
+        pairs = None
 
         try:
             # Load Data
@@ -609,86 +902,97 @@ def main():
                 spinner.start()
             
             txt_files = list(set(utils.glob_files_from_dir(source_path, suffix=".txt")) - set([output_path, f"{source_path}/{output_path}"]) - set(utils.glob_files_from_dir(cache, suffix="*")))
-            _l = len(txt_files)
+            columnar_files = [f for f in columnar.glob_columnar_files(source_path) if os.path.abspath(f) != os.path.abspath(output_path)]
+            _l = len(txt_files) + len(columnar_files)
             if _l == 0:
                 _log(f"No files to translate in \'{source_path}\'.", logger, spinner, 'error')
                 sys.exit(1)
-            _log(f"Found {_l} text file{'s' if _l > 1 else ''}.", logger, spinner, 'info')
+            _log(f"Found {_l} file{'s' if _l > 1 else ''} ({len(txt_files)} text, {len(columnar_files)} Arrow/Parquet).", logger, spinner, 'info')
             if is_interactive and spinner: spinner.stop()
             
             for t in txt_files: translate_data_files['translate'].append(t)
             
-            mem_before = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-            translate_dataset = load_dataset('text', data_files=translate_data_files, split="translate", cache_dir=cache)
-            mem_after = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-            _log(f"RAM memory used by translate dataset: {(mem_after - mem_before):n} MB", logger, spinner, 'debug')
-            to_translate = translate_dataset.unique('text')
+            with metrics.time("io", track_rss=True) as timer:
+                _datasets = [load_dataset('text', data_files=translate_data_files, split="translate", cache_dir=cache)] if txt_files else []
+                _datasets += [Dataset(InMemoryTable(pa.table({'text': columnar.read_texts(f)}))) for f in columnar_files]
+                translate_dataset = _datasets[0] if len(_datasets) == 1 else concatenate_datasets(_datasets)
+            _log(f"RAM memory used by translate dataset: {timer.rss_delta_mb:n} MB", logger, spinner, 'debug')
+            with metrics.time("dedup"):
+                to_translate = translate_dataset.unique('text')
+                if args.shard:
+                    to_translate = select_shard(to_translate, shard_index, shard_count)
             _ds = len(to_translate)
             _log(f"Translating {_ds:n} sentences...", logger, spinner, 'info')
             if is_interactive and spinner: spinner.start()
             
             # Load already translated data if any (skip if force mode is enabled)
-            time_before_1 = time.perf_counter()
-            if _force:
-                _log("Force mode enabled - ignoring cache and retranslating all sentences.", logger, spinner, 'info')
-                _t_ds = 0
-            else:
-                _log("Loading translated sentences...", logger, spinner, 'info')
-                if is_interactive and spinner: spinner.stop()
-                if Path(translated_input_path).exists() and Path(translated_input_path).is_file() and Path(output_path).exists() and Path(output_path).is_file():
-                    mem_before = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-                    translated_dataset = load_dataset('text', data_files=translated_data_files, split="translated", cache_dir=cache)
-                    mem_after = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-                    _log(f"RAM memory used by translated dataset: {(mem_after - mem_before):n} MB", logger, spinner, 'debug')
-                    been_translated = translated_dataset.unique('text')
-                    _t_ds = len(been_translated)
-                    _translated += been_translated
-                    _log(f"Translated {_t_ds:n} sentences already.", logger, spinner, 'info')
-                    
-                    mem_before = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-                    translation_dataset = load_dataset('text', data_files=translation_data_files, split="translation", cache_dir=cache)
-                    mem_after = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-                    _log(f"RAM memory used by translation dataset: {(mem_after - mem_before):n} MB", logger, spinner, 'debug')
-                    translations += translation_dataset.unique('text')
-                    if is_interactive and spinner: spinner.start()
-                else:
+            with metrics.time("cache_lookup") as timer_1:
+                if _force:
+                    _log("Force mode enabled - ignoring cache and retranslating all sentences.", logger, spinner, 'info')
                     _t_ds = 0
-                    _log("Not translated any sentences yet.", logger, spinner, 'info')
-                    if is_interactive and spinner: spinner.start()
-            time_after_1 = time.perf_counter()
-            _td_1 = time_after_1 - time_before_1
-            _log(f"Took {timedelta(seconds=_td_1)} second(s) to load {_t_ds:n} translated sentence(s).", logger, spinner, 'debug')
+                else:
+                    _log("Loading translated sentences...", logger, spinner, 'info')
+                    if is_interactive and spinner: spinner.stop()
+                    if columnar_output and (pairs := columnar.read_pairs(output_path)) is not None:
+                        # Resume from the source/translation columns of the output itself, the writer copies them over
+                        _t_ds = len(pairs[0])
+                        _log(f"Translated {_t_ds:n} sentences already.", logger, spinner, 'info')
+                        if translator.memory is not None:
+                            # Only the translation memory needs the previous pairs as text
+                            translator.remember(pairs[0].to_pylist(), pairs[1].to_pylist())
+                        if is_interactive and spinner: spinner.start()
+                    elif not columnar_output and Path(translated_input_path).exists() and Path(translated_input_path).is_file() and Path(output_path).exists() and Path(output_path).is_file():
+                        with metrics.time("io", track_rss=True) as timer:
+                            translated_dataset = load_dataset('text', data_files=translated_data_files, split="translated", cache_dir=cache)
+                        _log(f"RAM memory used by translated dataset: {timer.rss_delta_mb:n} MB", logger, spinner, 'debug')
+                        been_translated = translated_dataset.unique('text')
+                        _t_ds = len(been_translated)
+                        _translated += been_translated
+                        _log(f"Translated {_t_ds:n} sentences already.", logger, spinner, 'info')
+                    
+                        with metrics.time("io", track_rss=True) as timer:
+                            translation_dataset = load_dataset('text', data_files=translation_data_files, split="translation", cache_dir=cache)
+                        _log(f"RAM memory used by translation dataset: {timer.rss_delta_mb:n} MB", logger, spinner, 'debug')
+                        # Translations are aligned with their sources, they may repeat
+                        translations += translation_dataset['text']
+                        if len(_translated) == len(translations):
+                            translator.remember(_translated, translations)
+                        if is_interactive and spinner: spinner.start()
+                    else:
+                        _t_ds = 0
+                        _log("Not translated any sentences yet.", logger, spinner, 'info')
+                        if is_interactive and spinner: spinner.start()
+            _log(f"Took {timedelta(seconds=timer_1.seconds)} second(s) to load {_t_ds:n} translated sentence(s).", logger, spinner, 'debug')
             if is_interactive and spinner: spinner.start()
 
             # Filter translated data from all data to get untranslated data (skip if force mode)
-            time_before_2 = time.perf_counter()
-            if is_interactive and spinner: spinner.stop()
-            mem_before = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-            if _force or not _translated:
-                untranslated_dataset = translate_dataset
-                if _force:
-                    _log("Force mode: Translating all sentences regardless of cache...", logger, spinner, 'info')
-            else:
-                _log("Filtering untranslated sentences...", logger, spinner, 'info')
-
-                if is_interactive and spinner:
-                    spinner.start()
-                    spinner.text = "Filtering translated sentences..."
+            with metrics.time("dedup", track_rss=True) as timer_2:
+                if is_interactive and spinner: spinner.stop()
+                if _force or not _t_ds:
+                    # Input files may repeat sentences, only translate each one once
+                    untranslated_dataset = translate_dataset if len(translate_dataset) == _ds else Dataset.from_dict({'text': to_translate})
+                    if _force:
+                        _log("Force mode: Translating all sentences regardless of cache...", logger, spinner, 'info')
+                else:
+                    _log("Filtering untranslated sentences...", logger, spinner, 'info')
 
-                untranslated = { 'text': list( set(to_translate) - set(_translated) ) }
-                untranslated_dataset = Dataset.from_dict(untranslated)
+                    if is_interactive and spinner:
+                        spinner.start()
+                        spinner.text = "Filtering translated sentences..."
 
-                if is_interactive and spinner:
-                    spinner.stop()
-                    spinner.text = ""
+                    if pairs is not None:
+                        untranslated_dataset = Dataset(InMemoryTable(pa.table({'text': columnar.untranslated(to_translate, pairs[0])})))
+                    else:
+                        untranslated = { 'text': list( set(to_translate) - set(_translated) ) }
+                        untranslated_dataset = Dataset.from_dict(untranslated)
 
-            mem_after = psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
-            _log(f"RAM memory used by untranslated dataset: {(mem_after - mem_before):n} MB", logger, spinner, 'debug')
-            time_after_2 = time.perf_counter()
-            _td_2 = time_after_2 - time_before_2
-            untranslated = untranslated_dataset.unique('text')
+                    if is_interactive and spinner:
+                        spinner.stop()
+                        spinner.text = ""
+                untranslated = untranslated_dataset.unique('text')
+            _log(f"RAM memory used by untranslated dataset: {timer_2.rss_delta_mb:n} MB", logger, spinner, 'debug')
             _ut_ds = len(untranslated) # _ds - len(_translated)
-            _log(f"Took {timedelta(seconds=_td_2)} second(s) to compute {_ut_ds:n} untranslated sentence(s).", logger, spinner, 'debug')
+            _log(f"Took {timedelta(seconds=timer_2.seconds)} second(s) to compute {_ut_ds:n} untranslated sentence(s).", logger, spinner, 'debug')
             
             # Lets be absolutely sure we have the right amount of sentences
             assert _ds - _t_ds == _ut_ds, _log(f"{_ds=} - {_t_ds=} ({_ds - _t_ds}) != {_ut_ds=}", logger, spinner, 'error')
@@ -696,7 +1000,6 @@ def main():
             if is_interactive and spinner: spinner.start()
             
             # Translate untranslated data
-            time_before_3 = time.perf_counter()
             _log("Translating untranslated sentences...", logger, spinner, 'debug')
             
             i, _i, _t = 0, 0, 0
@@ -704,23 +1007,61 @@ def main():
             _log(f"Epoch size: {epoch_split:n}", logger, spinner, 'info')
 
             # Lets be absolutely sure epoch_split is not too small or too big
-            assert epoch_split > 0, _log(f"Value for {epoch_split=} is too small! Must be greater than 0.", logger, spinner, 'error')
-            assert epoch_split < _ut_ds, _log(f"Value for {epoch_split=} is too big! Must be smaller than the amount of sentences to translate ({_ut_ds}).", logger, spinner, 'error')
+            assert epoch_split > 0 or _ut_ds == 0, _log(f"Value for {epoch_split=} is too small! Must be greater than 0.", logger, spinner, 'error')
+            assert epoch_split <= _ut_ds, _log(f"Value for {epoch_split=} is too big! Must be smaller than the amount of sentences to translate ({_ut_ds}).", logger, spinner, 'error')
 
             if is_interactive and spinner:
                 spinner.start()
                 spinner.text = f"Processing first epoch of {epoch_split:n} sentences by batch of {batch_size:n} ({_ut_ds:n} ({nepoch:n} epochs) total)..."
             
-            for epoch in untranslated_dataset.iter(epoch_split):
-                _t = time.perf_counter()
-                _epoch_text =  epoch['text']
-                _translated += _epoch_text
-                # Here we translate the epoch
-                translations += translate_sentence(_epoch_text, translator)
+            if translator.token_cache is not None and _ut_ds:
+                with metrics.time("tokenize"):
+                    _added = translator.pretokenize(untranslated)
+                    _plan = translator.plan(untranslated, batch_size)
+                _log(f"Tokenized {_added:n} new sentence(s), {_ut_ds - _added:n} came from the token cache.", logger, spinner, 'info')
+                _log(f"Planned {_plan['tokens']:n} input token(s) in {_plan['batches']:n} batch(es), {_plan['tokens'] / max(1, _plan['padded_tokens']):.2%} of the padded batches are real tokens.", logger, spinner, 'info')
+
+            if columnar_output:
+                # Record batches are appended as epochs complete, after the pairs of a previous run
+                writer = columnar.TranslationWriter(output_path, _from, _to, args.model_id, previous=pairs)
+
+            if args.job_queue and _ut_ds:
+                queue = JobQueue(f"{cache}/jobs", lease_seconds=args.lease)
+                if queue.create(untranslated, chunk_size=args.job_chunk_size):
+                    _log(f"Created job queue of {len(queue.chunks()):n} chunk(s) under {queue.directory}.", logger, spinner, 'info')
+                _log(f"Joining job queue under {queue.directory} as {queue.worker_id}.", logger, spinner, 'info')
+
+                def _chunk_done(chunk, size):
+                    status = queue.status()
+                    update = f"Chunk {chunk:n} ({size:n} sentences) done | {status['done']:n}/{sum(status.values()):n} done, {status['leased']:n} leased, {status['pending']:n} pending"
+                    _log(update, logger, None, 'debug' if args.debug else 'info')
+                    if is_interactive and spinner: spinner.text = update
+
+                with metrics.time("epoch", track_rss=True):
+                    _chunks = queue.work(lambda texts: translate_sentence(texts, translator), on_chunk=_chunk_done)
+                _log(f"Translated {_chunks:n} chunk(s) in this process.", logger, spinner, 'info')
+                if not queue.claim_results():
+                    _log("All chunks are translated, another worker is collecting the results.", logger, spinner, 'success')
+                    sys.exit(0)
+                _sources, _translations = queue.results()
+                _translated += _sources
+                translations += _translations
+                if writer is not None:
+                    with metrics.time("io"):
+                        writer.write(_sources, _translations)
+
+            for epoch in (untranslated_dataset.iter(epoch_split) if _ut_ds and not args.job_queue else []):
+                with metrics.time("epoch", track_rss=True) as timer:
+                    _epoch_text =  epoch['text']
+                    _translated += _epoch_text
+                    # Here we translate the epoch
+                    _epoch_translations = translate_sentence(_epoch_text, translator)
+                    translations += _epoch_translations
+                    if writer is not None:
+                        with metrics.time("io"):
+                            writer.write(_epoch_text, _epoch_translations)
                 # Then we update statistics
-                time_meanwhile = time.perf_counter()
-                _td = time_meanwhile - _t
-                #_td2 = time_meanwhile - time_before_3
+                _td = timer.seconds
                 i += 1
                 _i += epoch_split
                 _avg1 = epoch_split/_td
@@ -730,14 +1071,14 @@ def main():
                 update = f"Epoch {i:n}/{nepoch:n} | {_i:n}/{_ut_ds:n} ({_i/_ut_ds:.2%}) | ~{_avg1:.2f} translation(s) / second | ETR: {timedelta(seconds=_etr)} | dT: {timedelta(seconds=_td)}"
                 _log(update, logger, None, 'debug' if args.debug else 'info')
                 if is_interactive and spinner: spinner.text = update
-            
-            time_after_3 = time.perf_counter()
-            _td_3 = time_after_3 - time_before_3
+            _td_3 = metrics.observations["epoch_seconds"]["sum"]
             
             if is_interactive and spinner: spinner.text = "Please wait..."
             _log("Checking translation results...", logger, spinner, 'debug' if args.debug else 'info')
             
-            if _ds != (_t_ds + _ut_ds) or _ds != len(translations):
+            # Columnar output holds the previous pairs, which are not read back as text
+            _n_translations = writer.rows if writer is not None else len(translations)
+            if _ds != (_t_ds + _ut_ds) or _ds != _n_translations:
                 has_failed = True
                 print(f"Loaded {_ds} sentences in {_from} for translation in {_to}.")
                 if _ds == (_t_ds + _ut_ds):
@@ -746,23 +1087,29 @@ def main():
                     has_failed = False
                 else:
                     _log(f"{_t_ds=} + {_ut_ds=} ({(_t_ds+_ut_ds)=}) != {_ds=}", logger, spinner, 'warning')
-                if _ds == len(translations):
+                if _ds == _n_translations:
                     print(f"You have translated all {_ds} sentences.")
                     has_failed = False
                 else:
-                    length_translations = len(translations)
-                    _log(f"{_ds=} != {length_translations=}", logger, spinner, 'error')
+                    _log(f"{_ds=} != {_n_translations=}", logger, spinner, 'error')
                     print(f"Not all {_ds} sentences have been translated.")
-                    print(f"Only {length_translations} have been.")
+                    print(f"Only {_n_translations} have been.")
                     has_failed = True
                 if has_failed: sys.exit(1)
             
             _log("Translation completed.", logger, spinner, 'success')
             _log(f"Took {timedelta(seconds=_td_3)} second(s) to translate {_ut_ds:n} sentences.", logger, spinner, 'info')
+            if translator.memory is not None:
+                _stats = translator.memory.stats()
+                _log(f"Translation memory: {_stats['hits']:n}/{_stats['lookups']:n} near-duplicate hit(s) ({_stats['hit_rate']:.2%}), {_stats['mean_lookup_ms']:.3f} ms per lookup.", logger, spinner, 'info')
+                if translator.flagged:
+                    _log(f"Flagged {len(translator.flagged):n} near-duplicate sentence(s).", logger, spinner, 'warning')
+            if translator.failed:
+                _log(f"Kept {len(translator.failed):n} sentence(s) untranslated after they failed on their own.", logger, spinner, 'warning')
 
             # Report translation
-            time_after = time.perf_counter()
-            _td = time_after - time_before
+            _td = time.perf_counter() - time_before
+            metrics.observe("directory_seconds", _td)
             _log(f"All files in {source_path} have been translated from {_from} to {_to}.", logger, spinner, 'sucess')
             _sgb = _ut_ds >> 30
             if _sgb > 0:
@@ -770,6 +1117,16 @@ def main():
             else:
                 _log(f"Took {timedelta(seconds=_td)} second(s) to translate less than 1 GB.", logger, spinner, 'info')
 
+            if writer is not None:
+                with metrics.time("io"):
+                    writer.close()
+                _log(f"Saved {writer.rows:n} translation(s) with their sources under {output_path}.", logger, spinner, 'info')
+
+            if args.shard:
+                with metrics.time("io"):
+                    utils.save_txt((pairs[0].to_pylist() if pairs is not None else []) + _translated, shard_sources_path)
+                _log(f"Saved the sources of shard {shard_index}/{shard_count} under {shard_sources_path}.", logger, spinner, 'info')
+
             if Path(cache).exists():
                 if is_interactive and spinner:
                     spinner.text = "Please wait..."
@@ -786,32 +1143,40 @@ def main():
         ) as exception:
             _log(str(exception), logger, spinner, 'error')
             _log("You are about to loose your progress!", logger, spinner, 'warning')
-            if _save_path and translations and _translated:
+            if writer is not None:
+                # Every written record batch is kept, the sources of the pending epoch are not
+                writer.close()
+                _log(f"Partial translation has been saved under {output_path}.", logger, spinner, 'success')
+            elif _save_path and translations and _translated:
                 with Path(translated_input_path) as p:
                     if not p.parent.exists():
                         p.parent.mkdir(parents=True, exist_ok=True)
                     if p.exists(): os.remove(p)
-                    utils.save_txt(_translated, p)
+                    with metrics.time("io"):
+                        utils.save_txt(_translated, p)
                 with Path(output_path) as _p:
                     if _p.exists():
                         os.remove(_p)
-                    utils.save_txt(translations, _p)         
+                    with metrics.time("io"):
+                        utils.save_txt(translations, _p)         
                 _log(f"Partial translation has been saved under {output_path}.", logger, spinner, 'success')
             #raise exception
             sys.exit(1)
     else:
-        translation = translate_sentence(_sentences, translator)
-        for t in translation: print(t)
-        translations.append(translation)
+        if args.stream:
+            translation = [stream_sentence(sentence, translator) for sentence in _sentences]
+        else:
+            translation = translate_sentence(_sentences, translator)
+            for t in translation: print(t)
+        translations += translation
     
-    if _save_path:
+    if _save_path and writer is None:
         with Path(_save_path) as p:
-            if not p.exists():
-                utils.save_txt(translations, p)
-            else:
+            if p.exists():
                 _log(f"{_save_path} exists already.", logger, spinner, 'warning')
                 _log("Translated sentences will be overwritten.", logger, spinner, 'info')
-                if p.exists(): os.remove(p)
+                os.remove(p)
+            with metrics.time("io"):
                 utils.save_txt(translations, p)
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+import time
+import zlib
+import logging
+
+from collections import defaultdict, OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+
+def _lsh_bands(num_perm, threshold):
+    """Choose the number of LSH bands whose detection threshold is just below the similarity threshold"""
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        if (1 / bands) ** (1 / rows) <= threshold:
+            return bands, rows
+    return num_perm, 1
+
+class TranslationMemory:
+    """Near-duplicate index over translated sentences using MinHash signatures of character n-grams.
+
+    Sentences whose estimated Jaccard similarity with an indexed sentence reaches the
+    threshold are hits, banded locality sensitive hashing keeps lookups sublinear. Beyond
+    max_entries sentences, the least recently matched ones are dropped from the index.
+    """
+
+    def __init__(self, threshold=0.9, ngram=3, num_perm=64, seed=42, max_entries=100_000) -> None:
+        self.threshold = threshold
+        self.ngram = ngram
+        self.num_perm = num_perm
+        self.max_entries = max_entries
+        self.bands, self.rows = _lsh_bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        # Entries are keyed by an ever increasing index, in least recently used order
+        self.sources = OrderedDict()
+        self.translations = {}
+        self._signatures = {}
+        self._next = 0
+        self.evictions = 0
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_seconds = 0.0
+
+    def __len__(self):
+        return len(self.sources)
+
+    def signature(self, text):
+        """Compute the MinHash signature of the character n-grams of a text"""
+        text = " ".join(text.split())
+        n = self.ngram
+        shingles = {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, source, translation=None, signature=None):
+        """Index a source sentence with its translation (which may be set later), returns its index"""
+        if signature is None:
+            signature = self.signature(source)
+        index = self._next
+        self._next += 1
+        self.sources[index] = source
+        self.translations[index] = translation
+        self._signatures[index] = signature
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket[key].append(index)
+        while self.max_entries and len(self.sources) > self.max_entries:
+            self._evict(next(iter(self.sources)))
+        return index
+
+    def _evict(self, index):
+        del self.sources[index]
+        del self.translations[index]
+        for bucket, key in zip(self._buckets, self._band_keys(self._signatures.pop(index))):
+            bucket[key].remove(index)
+            if not bucket[key]:
+                del bucket[key]
+        self.evictions += 1
+
+    def set_translation(self, index, translation):
+        """Set the translation of an indexed sentence, unless it was dropped meanwhile"""
+        if index in self.translations:
+            self.translations[index] = translation
+
+    def match(self, text, signature=None):
+        """Find the most similar indexed sentence, returns (index, similarity) or (None, 0.0)"""
+        _t = time.perf_counter()
+        if signature is None:
+            signature = self.signature(text)
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        best, similarity = None, 0.0
+        if candidates:
+            candidates = list(candidates)
+            similarities = (np.stack([self._signatures[i] for i in candidates]) == signature).mean(axis=1)
+            best, similarity = candidates[int(similarities.argmax())], float(similarities.max())
+        self.lookups += 1
+        if similarity < self.threshold:
+            best, similarity = None, 0.0
+        else:
+            self.hits += 1
+            self.sources.move_to_end(best)
+        self.lookup_seconds += time.perf_counter() - _t
+        return best, similarity
+
+    def stats(self):
+        """Get hit and lookup latency statistics"""
+        return {
+            'size': len(self),
+            'evictions': self.evictions,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'mean_lookup_ms': 1000 * self.lookup_seconds / self.lookups if self.lookups else 0.0,
+        }
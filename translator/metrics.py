@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+def rss_mb():
+    """Get the resident memory of the current process in MB"""
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+class PeakRSS:
+    """Poll the resident memory of the process in the background and keep its peak"""
+
+    def __init__(self, interval=0.01) -> None:
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _poll(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+class Timer:
+    """Outcome of a timed stage: wall time and resident memory delta"""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.rss_delta_mb = 0.0
+
+class Metrics:
+    """Counters, gauges and per-stage observations of a translation run.
+
+    Hooks registered with add_hook are called with (kind, name, value) for every
+    recorded value, kind being one of "counter", "gauge" or "observation".
+    """
+
+    def __init__(self) -> None:
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.peaks = {}
+        self.observations = defaultdict(lambda: {'count': 0, 'sum': 0.0, 'min': None, 'max': None})
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def add_hook(self, hook):
+        """Register a callable receiving (kind, name, value) for every recorded value"""
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        """Unregister a hook"""
+        self.hooks.remove(hook)
+
+    def _notify(self, kind, name, value):
+        for hook in self.hooks:
+            try:
+                hook(kind, name, value)
+            except Exception as exception:
+                logger.warning(f"Metrics hook {hook} failed: {exception}")
+
+    def count(self, name, value=1):
+        """Increase a counter"""
+        with self._lock:
+            self.counters[name] += value
+        self._notify("counter", name, value)
+
+    def gauge(self, name, value):
+        """Set a gauge, keeping track of its peak"""
+        with self._lock:
+            self.gauges[name] = value
+            self.peaks[name] = max(value, self.peaks.get(name, value))
+        self._notify("gauge", name, value)
+
+    def observe(self, name, value):
+        """Record one observation of a distribution (e.g. a stage duration or a batch fill ratio)"""
+        with self._lock:
+            o = self.observations[name]
+            o['count'] += 1
+            o['sum'] += value
+            o['min'] = value if o['min'] is None else min(o['min'], value)
+            o['max'] = value if o['max'] is None else max(o['max'], value)
+        self._notify("observation", name, value)
+
+    @contextmanager
+    def time(self, stage, track_rss=False):
+        """Time a stage as the "<stage>_seconds" observation, optionally tracking resident memory"""
+        timer = Timer()
+        mem_before = rss_mb() if track_rss else 0.0
+        _t = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            timer.seconds = time.perf_counter() - _t
+            self.observe(f"{stage}_seconds", timer.seconds)
+            if track_rss:
+                mem_after = rss_mb()
+                timer.rss_delta_mb = mem_after - mem_before
+                self.gauge("rss_mb", mem_after)
+
+    def summary(self):
+        """Get all recorded values as a JSON serializable dict"""
+        return {
+            'started': self.started,
+            'elapsed_seconds': time.time() - self.started,
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'peaks': dict(self.peaks),
+            'observations': {
+                name: dict(o, mean=o['sum'] / o['count'] if o['count'] else 0.0)
+                for name, o in self.observations.items()
+            },
+        }
+
+    def to_prometheus(self, prefix="interpres"):
+        """Render all recorded values in the Prometheus text exposition format"""
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value:g}"]
+        for name, value in sorted(self.gauges.items()):
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value:g}"]
+            lines += [f"# TYPE {prefix}_{name}_peak gauge", f"{prefix}_{name}_peak {self.peaks[name]:g}"]
+        for name, o in sorted(self.observations.items()):
+            lines += [f"# TYPE {prefix}_{name} summary", f"{prefix}_{name}_sum {o['sum']:g}", f"{prefix}_{name}_count {o['count']}"]
+        return "\n".join(lines) + "\n"
+
+    def save_summary(self, path):
+        """Write the JSON run summary"""
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def save_prometheus(self, path, prefix="interpres"):
+        """Write the metrics in Prometheus text format (e.g. for the node exporter textfile collector)"""
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus(prefix))
@@ -0,0 +1,77 @@
+import numpy as np
+import torch
+
+from transformers import BatchEncoding
+
+class NullTokenizer:
+    """Tokenizer mapping each character to its code point, pad is 0"""
+
+    pad_token_id = 0
+    all_special_ids = [0]
+
+    def __init__(self, model_max_length=500) -> None:
+        self.model_max_length = model_max_length
+
+    def __len__(self):
+        return 0x110000
+
+    def __call__(self, texts, padding=False, truncation=False, return_tensors=None, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        input_ids = [np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32) for text in texts]
+        if truncation:
+            input_ids = [ids[:self.model_max_length] for ids in input_ids]
+        if not return_tensors:
+            return BatchEncoding({'input_ids': [ids.tolist() for ids in input_ids]})
+        lengths = np.array([len(ids) for ids in input_ids], dtype=np.int64)
+        padded = np.zeros((len(input_ids), lengths.max(initial=0)), dtype=np.int64)
+        mask = np.arange(padded.shape[1]) < lengths[:, None]
+        if input_ids:
+            padded[mask] = np.concatenate(input_ids)
+        return BatchEncoding({'input_ids': torch.from_numpy(padded), 'attention_mask': torch.from_numpy(mask.astype(np.int64))})
+
+    def batch_decode(self, output_ids, **kwargs):
+        rows = output_ids.numpy().astype(np.uint32)
+        return [row.tobytes().decode("utf-32-le").rstrip("\x00") for row in rows]
+
+    def decode(self, token_ids, **kwargs):
+        return np.asarray(token_ids, dtype=np.uint32).tobytes().decode("utf-32-le").replace("\x00", "")
+
+class NullModel:
+    """Model returning each input reversed, at next to no cost"""
+
+    device = "cpu"
+
+    def generate(self, input_ids, attention_mask=None, max_new_tokens=None, streamer=None, **kwargs):
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        lengths = attention_mask.sum(dim=-1, keepdim=True)
+        positions = torch.arange(input_ids.shape[-1]).expand_as(input_ids)
+        output_ids = input_ids.gather(-1, (lengths - 1 - positions).clamp(min=0)) * (positions < lengths)
+        if max_new_tokens is not None:
+            output_ids = output_ids[:, :max_new_tokens]
+        if streamer is not None:
+            # Decoder start token first, then one token per step like generate does
+            streamer.put(torch.zeros(1, dtype=output_ids.dtype))
+            for step in range(output_ids.shape[-1]):
+                streamer.put(output_ids[:, step])
+            streamer.end()
+        return output_ids
+
+    def get_output_embeddings(self):
+        return None
+
+class NullPipeline:
+    """Stand-in for the transformers translation pipeline of a null backend"""
+
+    prefix = ""
+    generation_config = None
+
+    def __init__(self, model, tokenizer) -> None:
+        self.model = model
+        self.tokenizer = tokenizer
+
+    def __call__(self, texts, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        return [{'translation_text': text[::-1]} for text in texts]
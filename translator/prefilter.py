@@ -0,0 +1,36 @@
+import re
+
+# Inputs matching any of these are returned untranslated instead of going through the model.
+_UNTRANSLATABLE = re.compile(
+    r"""^\s*(?:
+        (?i:[a-z][a-z0-9+.\-]*://|www\.)\S+                             # URL
+        |(?i:mailto:)\S+|[\w.+\-]+@[\w\-]+(?:\.[\w\-]+)+                  # e-mail address
+        |(?:~|\.{1,2})?/[\w.\-~@%+/]*|[A-Za-z]:\\[^\s]*                   # file path
+        |(?:0x)?(?=[a-fA-F]*\d)[0-9a-fA-F]{7,}                            # hash
+        |[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}              # UUID
+        |[vV]?\d+(?:\.\d+)+(?:[-+][\w.]+)?                                  # version number
+        |[A-Za-z_$][\w$]*(?:(?:\.|::|->)[A-Za-z_$][\w$]*)+(?:\(\))?       # dotted identifier
+        |[A-Za-z$]*_[\w$]*|[a-z]+(?:[A-Z][a-z\d]*)+                       # snake_case, camelCase
+        |[\w.$]+\([^()]*\);?                                              # function call
+        |(?:%[-+\ \#0]*\d*(?:\.\d+)?[a-zA-Z%]|%\([^()]*\)[a-zA-Z]|\{[^{}]*\}|\$\{[^{}]*\}|\s)+  # placeholders
+        |(?:<[^<>]+>\s*)+                                                 # markup tags
+        |\#include\s*[<"].*|\#define\s+\w+.*|(?:def|function)\s+\w+\s*\(.*  # code statements
+        |from\s+[\w.]+\s+import\s+.*|import\s+[\w]+(?:\.[\w]+)+.*|(?:var|let|const)\s+\w+\s*=.*
+        |.*[=(].*;|.*\)\s*\{|[{}()\[\];]+
+    )\s*$""",
+    re.VERBOSE,
+)
+
+def is_translatable(text):
+    """Tell whether a text contains prose worth sending to the model.
+
+    Empty lines, numbers, punctuation, URLs, e-mail addresses, paths, identifiers,
+    placeholders and code-like lines are not.
+    """
+    if not any(c.isalpha() for c in text):
+        return False
+    return _UNTRANSLATABLE.match(text) is None
+
+def split_translatable(texts):
+    """Get the indexes of texts that need to be translated"""
+    return [i for i, text in enumerate(texts) if is_translatable(text)]
@@ -0,0 +1,149 @@
+import os
+import csv
+import json
+import logging
+
+from pathlib import Path
+from itertools import islice
+from collections import OrderedDict
+
+from translator import utils
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "csv")
+
+def parse_fields(fields):
+    """Parse a comma separated list of field names"""
+    names = [name.strip() for name in str(fields or "").split(",") if name.strip()]
+    if not names:
+        raise ValueError("No field to translate, expected e.g. --field title,body.")
+    return names
+
+def translated_field(field, target_language):
+    """Name of the field holding the translation of another"""
+    return f"{field}_{target_language}"
+
+def glob_record_files(path, fmt):
+    """Get the JSONL or CSV files, compressed or not, of a directory (or the file itself)"""
+    if Path(path).is_file():
+        return [str(path)]
+    return sorted(str(p) for p in Path(path).iterdir() if p.is_file() and utils.split_compression(p.name)[0].endswith(f".{fmt}") and ".tmp." not in p.name)
+
+def read_records(path, fmt):
+    """Stream the records of a JSONL or CSV file as dictionaries"""
+    with utils.open_text(path, 'r', newline="" if fmt == "csv" else None) as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exception:
+                raise ValueError(f"{path}:{number}: invalid JSON record ({exception}).") from exception
+
+class RecordWriter:
+    """Write records to a JSONL or CSV file as they come.
+
+    Records go to <path>.part (before any compression suffix) which is moved in place once every record is written,
+    an interrupted run leaves the part file behind instead of a truncated output.
+    """
+
+    def __init__(self, path, fmt) -> None:
+        self.path = str(path)
+        # The part file keeps the compression suffix of the output
+        output, compression = utils.split_compression(self.path)
+        self.part = f"{output}.part{compression}"
+        self.fmt = fmt
+        self.rows = 0
+        Path(self.part).parent.mkdir(parents=True, exist_ok=True)
+        self._file = utils.open_text(self.part, 'w', newline="" if fmt == "csv" else None)
+        self._csv = None
+
+    def write(self, record):
+        """Append a record"""
+        if self.fmt == "csv":
+            if self._csv is None:
+                # Columns of the first record, translated fields included
+                self._csv = csv.DictWriter(self._file, fieldnames=list(record), restval="", extrasaction="ignore")
+                self._csv.writeheader()
+            self._csv.writerow(record)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.rows += 1
+
+    def close(self, complete=True):
+        """Close the file, moving it in place when complete"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if complete:
+            os.replace(self.part, self.path)
+            logger.debug(f"Wrote {self.rows} record(s) to {self.path}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(complete=exc_type is None)
+
+class TranslationCache:
+    """Bounded map of source texts to translations, least recently used entries go first"""
+
+    def __init__(self, max_entries=100_000) -> None:
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+
+    def get(self, text):
+        self.lookups += 1
+        translation = self.entries.get(text)
+        if translation is not None:
+            self.hits += 1
+            self.entries.move_to_end(text)
+        return translation
+
+    def put(self, text, translation):
+        self.entries[text] = translation
+        self.entries.move_to_end(text)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+def translate_records(records, fields, translate, target_language, chunk_size=1000, cache=None):
+    """Translate some fields of a stream of records, yielding each record with the translations added.
+
+    Records are read chunk_size at a time; the distinct texts of all fields of a chunk
+    that are not cached from previous chunks are translated in a single call.
+    """
+    cache = TranslationCache() if cache is None else cache
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        known, pending = {}, []
+        for record in chunk:
+            for field in fields:
+                text = record.get(field)
+                if not isinstance(text, str) or not text.strip() or text in known:
+                    continue
+                known[text] = cache.get(text)
+                if known[text] is None:
+                    pending.append(text)
+        if pending:
+            translations = translate(pending)
+            if len(translations) != len(pending):
+                raise RuntimeError(f"{len(translations)} translation(s) for {len(pending)} text(s).")
+            for text, translation in zip(pending, translations):
+                known[text] = translation
+                cache.put(text, translation)
+        for record in chunk:
+            for field in fields:
+                if field in record:
+                    # Empty and non-text values are copied as is
+                    record[translated_field(field, target_language)] = known.get(record[field], record[field]) if isinstance(record[field], str) else record[field]
+            yield record
@@ -0,0 +1,99 @@
+import re
+
+# Sentence final punctuation followed by closing quotes/brackets and whitespace,
+# or CJK/Arabic/Devanagari terminators which need no whitespace after them.
+_BOUNDARY = re.compile(r'(?:[.!?…]+["\'»”’)\]]*(?P<space>\s+))|(?:[。！？؟।]+["\'»”’）」』]*(?P<cjk_space>\s*))')
+
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e", "cf", "fig", "no", "vol",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "approx", "inc", "ltd", "co",
+    "m", "mme", "mlle", "av", "bd", "p", "pp", "ca", "bzw", "usw", "z.b", "sig", "sra", "srta",
+}
+
+def _is_abbreviation(text, end):
+    words = text[:end].split()
+    if not words:
+        return False
+    word = words[-1].lower().lstrip("(\"'«“‘")
+    return len(word) == 1 or word in _ABBREVIATIONS or "." in word
+
+def split_sentences(text):
+    """Split a paragraph into sentences, returning them with the separators found after each of them"""
+    sentences, separators = [], []
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        space = match.group('space') if match.group('space') is not None else match.group('cjk_space')
+        end = match.end() - len(space)
+        if match.end() >= len(text):
+            break
+        if match.group('space') is not None:
+            following = text[match.end()]
+            if following.islower() or following.isdigit():
+                continue
+            if text[match.start():end] == "." and _is_abbreviation(text, match.start()):
+                continue
+        sentences.append(text[start:end])
+        separators.append(space)
+        start = match.end()
+    sentences.append(text[start:])
+    separators.append("")
+    return sentences, separators
+
+def split_words(text, max_tokens, count_tokens):
+    """Split a text on whitespace into chunks of at most max_tokens tokens"""
+    words = text.split(" ")
+    special_tokens = count_tokens([""])[0]
+    chunks, separators = [], []
+    chunk, chunk_tokens = [], special_tokens
+    for word, tokens in zip(words, count_tokens(words)):
+        tokens -= special_tokens
+        if chunk and chunk_tokens + tokens > max_tokens:
+            chunks.append(" ".join(chunk))
+            separators.append(" ")
+            chunk, chunk_tokens = [], special_tokens
+        chunk.append(word)
+        chunk_tokens += tokens
+    chunks.append(" ".join(chunk))
+    separators.append("")
+    return chunks, separators
+
+def segment(texts, max_tokens, count_tokens):
+    """Split texts longer than max_tokens tokens into sentences.
+
+    Returns the pieces to translate and a plan to reassemble their translations with `reassemble`.
+    """
+    pieces, plan = [], []
+    lengths = {}
+    long_texts = [text for text in texts if len(text) > max_tokens]
+    if long_texts:
+        lengths = dict(zip(long_texts, count_tokens(long_texts)))
+    for text in texts:
+        if lengths.get(text, 0) <= max_tokens:
+            plan.append((len(pieces), None))
+            pieces.append(text)
+            continue
+        sentences, separators = split_sentences(text)
+        sentence_lengths = count_tokens(sentences)
+        _pieces, _separators = [], []
+        for sentence, separator, length in zip(sentences, separators, sentence_lengths):
+            if length > max_tokens:
+                chunks, chunk_separators = split_words(sentence, max_tokens, count_tokens)
+                chunk_separators[-1] = separator
+                _pieces += chunks
+                _separators += chunk_separators
+            else:
+                _pieces.append(sentence)
+                _separators.append(separator)
+        plan.append((len(pieces), _separators))
+        pieces += _pieces
+    return pieces, plan
+
+def reassemble(translations, plan):
+    """Join translated pieces back into the texts they were segmented from"""
+    results = []
+    for start, separators in plan:
+        if separators is None:
+            results.append(translations[start])
+        else:
+            results.append("".join(t + s for t, s in zip(translations[start:start + len(separators)], separators)))
+    return results
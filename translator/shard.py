@@ -0,0 +1,83 @@
+import os
+import re
+import hashlib
+import logging
+
+from pathlib import Path
+
+from translator import utils
+
+logger = logging.getLogger(__name__)
+
+def parse_shard(shard):
+    """Parse a shard given as "i/N" (1 <= i <= N) into (i, N)"""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", str(shard))
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise ValueError(f"Invalid shard {shard!r}, expected i/N with 1 <= i <= N (e.g. 2/4).")
+    return int(match.group(1)), int(match.group(2))
+
+def shard_of(text, count):
+    """Get the shard (1 to count) of a source string, stable across hosts and Python processes"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+def select_shard(texts, index, count):
+    """Keep the texts assigned to shard index out of count"""
+    return [text for text in texts if shard_of(text, count) == index]
+
+def shard_paths(output_path, source_language, index, count):
+    """Get the translation and source files of a shard of an output file.
+
+    Both end in .tmp.txt (compressed like the output) so they are never picked up as input by directory mode.
+    """
+    output_path, compression = utils.split_compression(output_path)
+    stem = output_path[:-len(".txt")] if output_path.endswith(".txt") else output_path
+    return f"{stem}.shard-{index}-of-{count}.tmp.txt{compression}", f"{stem}.shard-{index}-of-{count}.{source_language}.tmp.txt{compression}"
+
+def find_shards(output_path):
+    """Find the shard translation files of an output file, returns {index: path} and the shard count"""
+    output_path, compression = utils.split_compression(output_path)
+    stem = output_path[:-len(".txt")] if output_path.endswith(".txt") else output_path
+    directory, name = os.path.split(stem)
+    pattern = re.compile(rf"{re.escape(name)}\.shard-(\d+)-of-(\d+)\.tmp\.txt{re.escape(compression)}")
+    shards, counts = {}, set()
+    for path in Path(directory or ".").iterdir():
+        match = pattern.fullmatch(path.name)
+        if match:
+            shards[int(match.group(1))] = str(path)
+            counts.add(int(match.group(2)))
+    if len(counts) > 1:
+        raise ValueError(f"Found shards of different counts {sorted(counts)} for {output_path}.")
+    return shards, counts.pop() if counts else 0
+
+def merge_shards(output_path, source_language, target_language):
+    """Combine shard outputs into the translated/translation cache pair directory mode resumes from.
+
+    Pairs already in the cache are kept, returns the number of merged pairs and the missing shards.
+    """
+    shards, count = find_shards(output_path)
+    if not shards:
+        raise FileNotFoundError(f"No shard found for {output_path}.")
+    cache, translated_input_path = utils.get_resume_paths(output_path, source_language, target_language)
+    sources, translations = [], []
+    if Path(translated_input_path).is_file() and Path(output_path).is_file():
+        sources, translations = utils.read_txt(translated_input_path), utils.read_txt(output_path)
+        if len(sources) != len(translations):
+            raise ValueError(f"{translated_input_path} and {output_path} are not aligned ({len(sources)} != {len(translations)}).")
+    seen = set(sources)
+    for index in sorted(shards):
+        _, shard_sources_path = shard_paths(output_path, source_language, index, count)
+        shard_sources, shard_translations = utils.read_txt(shard_sources_path), utils.read_txt(shards[index])
+        if len(shard_sources) != len(shard_translations):
+            raise ValueError(f"Shard {index}/{count} is not aligned ({len(shard_sources)} sources != {len(shard_translations)} translations).")
+        for source, translation in zip(shard_sources, shard_translations):
+            if source not in seen:
+                seen.add(source)
+                sources.append(source)
+                translations.append(translation)
+    Path(cache).mkdir(parents=True, exist_ok=True)
+    utils.save_txt(sources, translated_input_path)
+    utils.save_txt(translations, output_path)
+    missing = [index for index in range(1, count + 1) if index not in shards]
+    logger.debug(f"Merged {len(shards)}/{count} shard(s) into {len(sources)} pair(s) under {cache}.")
+    return len(sources), missing
@@ -0,0 +1,116 @@
+import json
+import hashlib
+import logging
+import unicodedata
+
+from functools import lru_cache
+from pathlib import Path
+
+import torch
+
+from translator import utils
+from translator.language import SCRIPTS
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def _char_script(char):
+    """Return the Unicode name of a letter, None for digits, punctuation and symbols"""
+    if not unicodedata.category(char).startswith(("L", "M")):
+        return None
+    return unicodedata.name(char, "")
+
+def token_matches_script(token, prefixes):
+    """Check that every letter of a vocabulary token is written in one of the given scripts"""
+    for char in token.replace("▁", ""):
+        name = _char_script(char)
+        if name is not None and not name.startswith(prefixes):
+            return False
+    return True
+
+def build_vocab_shortlist(tokenizer, target_language):
+    """Select the tokens of the vocabulary that can be written in the script of the target language"""
+    script = target_language.split("_")[-1] if "_" in target_language else None
+    prefixes = SCRIPTS.get(script)
+    if not prefixes:
+        return None
+    tokens = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+    ids = {i for i, token in enumerate(tokens) if token is not None and token_matches_script(token, prefixes)}
+    return ids | set(tokenizer.all_special_ids)
+
+def build_corpus_shortlist(tokenizer, corpus_files, chunk_size=1024):
+    """Select the tokens seen in a target language corpus plus script-neutral tokens (numbers, punctuation)"""
+    ids = set(tokenizer.all_special_ids)
+    tokens = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+    ids |= {i for i, token in enumerate(tokens) if token is not None and token_matches_script(token, ())}
+    for corpus_file in corpus_files:
+        lines = [l for l in utils.read_txt(corpus_file) if l.strip()]
+        for i in range(0, len(lines), chunk_size):
+            for input_ids in tokenizer(lines[i:i + chunk_size], add_special_tokens=False)["input_ids"]:
+                ids.update(input_ids)
+    return ids
+
+def _shortlist_path(model_id, target_language, corpus_files=None):
+    if corpus_files:
+        digest = hashlib.sha1()
+        for corpus_file in sorted(corpus_files):
+            p = Path(corpus_file)
+            digest.update(f"{p.resolve()}:{p.stat().st_size}:{p.stat().st_mtime_ns}".encode())
+        source = digest.hexdigest()[:16]
+    else:
+        source = "vocab"
+    model_name = str(model_id).strip("/").replace("/", "--")
+    return utils.get_cache_dir("shortlists") / f"{model_name}.{target_language}.{source}.json"
+
+def load_shortlist(tokenizer, model_id, target_language, corpus=None):
+    """Build (or load from cache) the token ids the decoder may produce for the target language"""
+    corpus_files = None
+    if corpus:
+        corpus_files = utils.glob_files_from_dir(corpus) if Path(corpus).is_dir() else [corpus]
+    path = _shortlist_path(model_id, target_language, corpus_files)
+    if path.exists():
+        with open(path, 'r') as f:
+            return json.load(f)
+    if corpus_files:
+        ids = build_corpus_shortlist(tokenizer, corpus_files)
+    else:
+        ids = build_vocab_shortlist(tokenizer, target_language)
+    if ids is None:
+        logger.warning(f"No vocabulary shortlist available for {target_language}.")
+        return None
+    ids = sorted(ids)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(ids, f)
+    logger.debug(f"Cached shortlist of {len(ids)} tokens under {path}.")
+    return ids
+
+class ShortlistedLMHead(torch.nn.Module):
+    """Output projection computing logits for a subset of the vocabulary only.
+
+    Logits of tokens outside of the shortlist are set to the lowest finite value so
+    generated ids stay in the full vocabulary space.
+    """
+
+    def __init__(self, lm_head, token_ids):
+        super().__init__()
+        ids = torch.tensor(sorted(token_ids), dtype=torch.long, device=lm_head.weight.device)
+        self.vocab_size = lm_head.weight.shape[0]
+        self.register_buffer("token_ids", ids, persistent=False)
+        self.weight = torch.nn.Parameter(lm_head.weight.detach().index_select(0, ids), requires_grad=False)
+        bias = getattr(lm_head, "bias", None)
+        self.bias = torch.nn.Parameter(bias.detach().index_select(0, ids), requires_grad=False) if bias is not None else None
+
+    def forward(self, hidden_states):
+        logits = torch.nn.functional.linear(hidden_states, self.weight, self.bias)
+        full = logits.new_full((*logits.shape[:-1], self.vocab_size), torch.finfo(logits.dtype).min)
+        return full.index_copy_(-1, self.token_ids, logits)
+
+def apply_shortlist(model, token_ids):
+    """Restrict the output projection of a seq2seq model to the given token ids"""
+    lm_head = model.get_output_embeddings()
+    if lm_head is None or isinstance(lm_head, ShortlistedLMHead):
+        return model
+    model.set_output_embeddings(ShortlistedLMHead(lm_head, token_ids))
+    logger.debug(f"Restricted output projection to {len(token_ids)}/{lm_head.weight.shape[0]} tokens.")
+    return model
@@ -0,0 +1,30 @@
+import re
+
+# Values masked into slots: URLs, e-mail addresses, UUIDs, format placeholders and numbers.
+_VALUES = re.compile(
+    r"""(?:[a-zA-Z][a-zA-Z0-9+.\-]*://|www\.)[^\s<>"']*[^\s<>"'.,;:!?)\]]
+    |[\w.+\-]+@[\w\-]+(?:\.[\w\-]+)+
+    |[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}
+    |%\([^()\s]*\)[-+\ \#0]*\d*(?:\.\d+)?[a-zA-Z]|%[-+\ \#0]*\d*(?:\.\d+)?[sdifgeExXouc]
+    |\$\{[^{}]*\}|\{[^{}\s]*\}
+    |(?<![\w.,{])[-+]?\d+(?:[.,:]\d+)*(?![\w{])""",
+    re.VERBOSE,
+)
+_SLOT = re.compile(r"\{(\d+)\}")
+
+def mask(text):
+    """Replace the values of a text by numbered slots, returning the skeleton and the values"""
+    values = []
+
+    def _slot(match):
+        values.append(match.group(0))
+        return f"{{{len(values) - 1}}}"
+
+    return _VALUES.sub(_slot, text), values
+
+def unmask(translation, values):
+    """Put the values back into the slots of a translated skeleton, None if the slots did not survive"""
+    slots = [int(i) for i in _SLOT.findall(translation)]
+    if sorted(slots) != list(range(len(values))):
+        return None
+    return _SLOT.sub(lambda match: values[int(match.group(1))], translation)
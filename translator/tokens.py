@@ -0,0 +1,123 @@
+import os
+import time
+import hashlib
+import logging
+
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import torch
+
+from transformers import BatchEncoding
+
+from translator import utils
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = pa.schema([
+    ("text", pa.string()),
+    ("input_ids", pa.list_(pa.int32())),
+    ("length", pa.int32()),
+])
+
+def token_cache_dir(tokenizer, model_id, source_language, max_length, prefix=""):
+    """Cache directory of the token ids of a tokenizer, source language, truncation length and prefix.
+
+    Token ids do not depend on the target language, they are shared by every target.
+    """
+    name = str(model_id).strip("/").replace("/", "--")
+    key = hashlib.blake2b(f"{type(tokenizer).__name__}:{len(tokenizer)}:{prefix}".encode("utf-8"), digest_size=8).hexdigest()
+    return utils.get_cache_dir("tokens", name, f"{source_language}.{max_length}.{key}")
+
+class TokenCache:
+    """Token ids of source texts stored as Arrow files in a cache directory.
+
+    Every call to add writes one more file so concurrent processes never write the same
+    one. All files are memory-mapped and ids are sliced out of their Arrow buffers, only
+    the text index lives in Python.
+    """
+
+    def __init__(self, directory, pad_token_id=0, padding_side="right") -> None:
+        self.directory = Path(directory)
+        self.pad_token_id = pad_token_id if pad_token_id is not None else 0
+        self.padding_side = padding_side
+        self._segments = []
+        self._index = {}
+        self._loaded = set()
+        self.refresh()
+
+    def refresh(self):
+        """Load the files other processes added meanwhile"""
+        if not self.directory.is_dir():
+            return
+        for path in sorted(self.directory.glob("*.arrow")):
+            if path.name not in self._loaded:
+                self._load(path)
+
+    def _load(self, path):
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        texts, input_ids = table.column("text"), table.column("input_ids")
+        for text_chunk, ids_chunk in zip(texts.chunks, input_ids.chunks):
+            segment = len(self._segments)
+            # Offsets and values of a list array give each row's ids without copying
+            self._segments.append((ids_chunk.offsets.to_numpy(), ids_chunk.values.to_numpy()))
+            for row, text in enumerate(text_chunk.to_pylist()):
+                self._index.setdefault(text, (segment, row))
+        self._loaded.add(path.name)
+
+    def __contains__(self, text):
+        return text in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def missing(self, texts):
+        """Get the distinct texts without token ids yet"""
+        return [text for text in dict.fromkeys(texts) if text not in self._index]
+
+    def add(self, texts, input_ids):
+        """Store the token ids of texts in a new file"""
+        if not texts:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lengths = [len(ids) for ids in input_ids]
+        batch = pa.record_batch([
+            pa.array(texts, pa.string()),
+            pa.array(input_ids, pa.list_(pa.int32())),
+            pa.array(lengths, pa.int32()),
+        ], schema=SCHEMA)
+        path = self.directory / f"{time.time_ns()}-{os.getpid()}.arrow"
+        tmp = f"{path}.part"
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_batch(batch)
+        os.replace(tmp, path)
+        self._load(path)
+        logger.debug(f"Cached the token ids of {len(texts)} text(s) under {path}.")
+
+    def ids(self, text):
+        """Get the token ids of a cached text"""
+        segment, row = self._index[text]
+        offsets, values = self._segments[segment]
+        return values[offsets[row]:offsets[row + 1]]
+
+    def lengths(self, texts):
+        """Get the number of tokens of cached texts"""
+        lengths = []
+        for text in texts:
+            segment, row = self._index[text]
+            offsets, _ = self._segments[segment]
+            lengths.append(int(offsets[row + 1] - offsets[row]))
+        return lengths
+
+    def encode(self, texts):
+        """Build padded model inputs of cached texts"""
+        input_ids = [self.ids(text) for text in texts]
+        lengths = np.array([len(ids) for ids in input_ids], dtype=np.int64)
+        width = int(lengths.max(initial=0))
+        padded = np.full((len(texts), width), self.pad_token_id, dtype=np.int64)
+        positions = np.arange(width)
+        mask = positions < lengths[:, None] if self.padding_side == "right" else positions >= (width - lengths)[:, None]
+        if input_ids:
+            padded[mask] = np.concatenate(input_ids)
+        return BatchEncoding({'input_ids': torch.from_numpy(padded), 'attention_mask': torch.from_numpy(mask.astype(np.int64))})
@@ -1,12 +1,30 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+from transformers import pipeline, TextIteratorStreamer
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque, OrderedDict
 import torch
+import time
 import logging
+import threading
+
+from translator.shortlist import load_shortlist, apply_shortlist
+from translator.segment import segment, reassemble
+from translator.prefilter import split_translatable, is_translatable
+from translator.templates import mask, unmask
+from translator.memory import TranslationMemory
+from translator.langid import LanguageIdentifier, load_samples
+from translator.metrics import Metrics
+from translator.null import NullModel, NullTokenizer, NullPipeline
+from translator.guard import MemoryGuard, is_out_of_memory
+from translator.records import TranslationCache
+from translator.tokens import TokenCache, token_cache_dir
+from translator.loading import load_model
+from translator.language import NLLB, registry_for
 
 logger = logging.getLogger(__name__)
 
 class Translator:
-    
-    def __init__(self, source_language, target_language, max_length=500, model_id="facebook/nllb-200-distilled-600M", pipe_line="translation", batch_size=128, n_proc=4) -> None:
+
+    def __init__(self, source_language, target_language, max_length=500, model_id="facebook/nllb-200-distilled-600M", pipe_line="translation", batch_size=128, n_proc=4, shortlist=False, shortlist_corpus=None, num_beams=None, early_stopping=None, length_ratio=None, length_offset=10, segment_length=None, prefilter=False, templates=False, template_cache_size=100000, memory_threshold=None, memory_mode="reuse", memory_size=100000, langid=False, langid_threshold=0.9, langid_samples=None, metrics=None, backend="transformers", max_rss=None, token_cache=False, pin_model=False, offline=False, preloaded=None, draft_model_id=None) -> None:
         self.logger = logger or logging.getLogger(__name__)
         self.logger.debug("Initializing Translator...")
         self.source = source_language
@@ -17,31 +35,549 @@ class Translator:
         self.logger.debug(f"{self.model_id}")
         self.n_proc = n_proc
         self.batch_size = batch_size
+        self.max_length = max_length
+        self.num_beams = num_beams
+        self.early_stopping = early_stopping
+        self.length_ratio = length_ratio
+        self.length_offset = length_offset
+        self.segment_length = segment_length
+        self.prefilter = prefilter
+        self.templates = templates
+        self.template_cache_size = template_cache_size
+        self._skeletons = OrderedDict()
+        self.memory = TranslationMemory(memory_threshold, max_entries=memory_size) if memory_threshold else None
+        self.memory_mode = memory_mode
+        self.flagged = []
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.guard = MemoryGuard(max_rss)
+        self.failed = []
+        self.language_identifier = None
+        self.langid_threshold = langid_threshold
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
         self.logger.debug(f"{self.device}")
-        self.logger.debug("Loading model...")
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_id, max_length=max_length)
-        self.logger.debug("Loading tokenizer...")
-        self.tokenizer = AutoTokenizer.from_pretrained(model_id, model_max_length=max_length)
-        self.logger.debug("Setting up translation pipeline...")
-        self.translator = pipeline(
-            "translation",
-            model=self.model,
-            tokenizer=self.tokenizer,
-            src_lang=source_language,
-            tgt_lang=target_language,
-            max_length=max_length,
-            # device=self.device,
-        )
+        self.backend = backend
+        self.logger.debug(f"{self.backend}")
+        self.model_path = model_id
+        self.load_report = {}
+        _t = time.perf_counter()
+        if backend == "null":
+            # Deterministic reverse transform to measure everything but the model
+            self.model = NullModel()
+            self.tokenizer = NullTokenizer(model_max_length=max_length)
+            self.translator = NullPipeline(self.model, self.tokenizer)
+            self.languages = NLLB
+            source_language, target_language = self.resolve_language(source_language), self.resolve_language(target_language)
+            self.source, self.target = source_language, target_language
+        elif backend == "transformers":
+            if preloaded is not None and preloaded.matches(model_id, max_length):
+                # Loaded in the background, only the language pair is left to bind
+                self.logger.debug("Waiting for the preloaded model...")
+                self.model, self.tokenizer, self.model_path, report = preloaded.result()
+            else:
+                self.model, self.tokenizer, self.model_path, report = load_model(model_id, max_length, pin=pin_model, offline=offline)
+            for part, load in report.items():
+                self._report_load(part, load['seconds'], load['rss_mb'])
+            self.languages = registry_for(model_id, self.tokenizer)
+            source_language, target_language = self.resolve_language(source_language), self.resolve_language(target_language)
+            self.source, self.target = source_language, target_language
+            if shortlist or shortlist_corpus:
+                self.logger.debug("Building vocabulary shortlist...")
+                token_ids = load_shortlist(self.tokenizer, model_id, target_language, corpus=shortlist_corpus)
+                if token_ids:
+                    apply_shortlist(self.model, token_ids)
+            self.logger.debug("Setting up translation pipeline...")
+            with self.metrics.time("load_pipeline", track_rss=True) as timer:
+                self.translator = pipeline(
+                    "translation",
+                    model=self.model,
+                    tokenizer=self.tokenizer,
+                    src_lang=source_language,
+                    tgt_lang=target_language,
+                    max_length=max_length,
+                    # device=self.device,
+                )
+            self._report_load("pipeline", timer.seconds, timer.rss_delta_mb)
+        else:
+            raise NotImplementedError(f"{backend=} is not supported.")
+        if langid or langid_samples:
+            # Checked on the resolved codes, which the identified languages are compared to
+            self.language_identifier = LanguageIdentifier(load_samples(langid_samples) if langid_samples else None)
+            for language in (target_language, source_language):
+                if self.language_identifier is not None and not self.language_identifier.supports(language):
+                    # Lines in an unknown source language would be taken for the closest known one
+                    self.logger.warning(f"Cannot identify {language}, lines already in the target language will be translated anyway.")
+                    self.language_identifier = None
+        self.draft_model = None
+        if draft_model_id and backend == "transformers":
+            self._load_draft(draft_model_id, max_length, pin_model, offline)
+        elif draft_model_id:
+            self.logger.warning(f"The {backend} backend does not use draft models, ignoring {draft_model_id}.")
+        self.token_cache = None
+        if token_cache:
+            # Token ids are read back from memory-mapped Arrow files instead of tokenizing again
+            self.token_cache = TokenCache(token_cache_dir(self.tokenizer, model_id, source_language, max_length, self.translator.prefix or ""), self.tokenizer.pad_token_id, getattr(self.tokenizer, "padding_side", "right"))
+            self.logger.debug(f"Token cache holds {len(self.token_cache)} text(s).")
+        self.metrics.observe("load_seconds", time.perf_counter() - _t)
         self.logger.debug("Translator has been successfully loaded.")
 
-    def translate(self, to_translate, num_workers=None, batch_size=None):
-        
+    def resolve_language(self, lang):
+        """Get the code of the model closest to a language tag, the tag itself if there is none"""
+        if not self.languages or lang in self.languages:
+            return lang
+        code = self.languages.resolve(lang)
+        if code in self.languages:
+            self.logger.debug(f"Using {code} for {lang}.")
+            return code
+        self.logger.warning(f"{lang} is not a language of {self.model_id}.")
+        return lang
+
+    def _report_load(self, part, seconds, rss_delta_mb):
+        self.load_report[part] = {'seconds': seconds, 'rss_mb': rss_delta_mb}
+        if part != "pipeline":
+            self.metrics.observe(f"load_{part}_seconds", seconds)
+        self.metrics.observe(f"load_{part}_rss_mb", rss_delta_mb)
+        self.logger.debug(f"Loaded {part} in {seconds:.2f}s (+{rss_delta_mb:.0f} MB RSS).")
+
+    def _load_draft(self, draft_model_id, max_length, pin_model, offline):
+        # The draft proposes tokens the model verifies, they must share a vocabulary
+        draft_model, draft_tokenizer, _, report = load_model(draft_model_id, max_length, pin=pin_model, offline=offline)
+        if draft_tokenizer.get_vocab() != self.tokenizer.get_vocab():
+            raise ValueError(f"Draft model {draft_model_id} does not share the vocabulary of {self.model_id}.")
+        self._report_load("draft", sum(load['seconds'] for load in report.values()), sum(load['rss_mb'] for load in report.values()))
+        if self.num_beams is None:
+            # Assisted decoding verifies greedy choices
+            self.num_beams = 1
+        if self.num_beams > 1:
+            self.logger.warning(f"Assisted decoding only works with greedy decoding, ignoring draft model {draft_model_id} for beam search.")
+        self.draft_model = draft_model
+
+    def _generate_assisted(self, inputs, kwargs):
+        # Assisted generation runs one sentence at a time, without padding
+        extra = {key: value for key, value in inputs.items() if key not in ("input_ids", "attention_mask")}
+        outputs = []
+        for input_ids, attention_mask in zip(inputs["input_ids"], inputs["attention_mask"]):
+            input_ids = input_ids[attention_mask.bool()].unsqueeze(0).to(self.model.device)
+            outputs.append(self.model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), generation_config=self.translator.generation_config, assistant_model=self.draft_model, **extra, **kwargs)[0])
+        pad_token_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else 0
+        return torch.nn.utils.rnn.pad_sequence(outputs, batch_first=True, padding_value=pad_token_id)
+
+    def generation_kwargs(self, input_length):
+        """Get the generation settings for a batch whose longest input has input_length tokens"""
+        kwargs = {}
+        if self.num_beams:
+            kwargs['num_beams'] = self.num_beams
+        if self.early_stopping is not None:
+            kwargs['early_stopping'] = self.early_stopping
+        if self.length_ratio:
+            kwargs['max_new_tokens'] = max(1, min(int(self.length_ratio * input_length + self.length_offset), self.max_length))
+        return kwargs
+
+    def count_tokens(self, texts):
+        """Count the tokens of each text as seen by the model"""
+        return [len(input_ids) for input_ids in self.tokenizer(texts, verbose=False)["input_ids"]]
+
+    def token_ids(self, texts):
+        """Tokenize texts without padding, as encode does"""
+        if getattr(self.tokenizer, "_build_translation_inputs", None):
+            return self.tokenizer._build_translation_inputs(texts, return_tensors=None, src_lang=self.source, tgt_lang=self.target, truncation=True)["input_ids"]
+        prefix = self.translator.prefix or ""
+        return self.tokenizer([prefix + text for text in texts], truncation=True)["input_ids"]
+
+    def pretokenize(self, texts, chunk_size=100000):
+        """Tokenize the distinct texts missing from the token cache and store them, returns how many were added"""
+        if self.token_cache is None:
+            return 0
+        missing = self.token_cache.missing(texts)
+        with self.metrics.time("tokenize"):
+            for s in range(0, len(missing), chunk_size):
+                chunk = missing[s:s + chunk_size]
+                self.token_cache.add(chunk, self.token_ids(chunk))
+        self.metrics.count("token_cache_hits", len(set(texts)) - len(missing))
+        return len(missing)
+
+    def plan(self, texts, batch_size=None):
+        """Count the tokens of texts and the padded tokens of their length sorted batches, from the token cache"""
+        self.pretokenize(texts)
+        lengths = sorted(self.token_cache.lengths(dict.fromkeys(texts)), reverse=True)
+        batch_size = batch_size or self.batch_size
+        return {
+            'texts': len(lengths),
+            'tokens': sum(lengths),
+            'padded_tokens': sum(lengths[s] * len(lengths[s:s + batch_size]) for s in range(0, len(lengths), batch_size)),
+            'batches': -(-len(lengths) // batch_size),
+        }
+
+    def encode(self, batch):
+        """Tokenize a batch of sentences for the model"""
+        with self.metrics.time("tokenize"):
+            if self.token_cache is not None and all(text in self.token_cache for text in batch):
+                inputs = self.token_cache.encode(batch)
+                if getattr(self.tokenizer, "_build_translation_inputs", None):
+                    inputs["forced_bos_token_id"] = self.tokenizer.convert_tokens_to_ids(self.target)
+            elif getattr(self.tokenizer, "_build_translation_inputs", None):
+                inputs = self.tokenizer._build_translation_inputs(batch, return_tensors="pt", src_lang=self.source, tgt_lang=self.target, padding=True, truncation=True)
+            else:
+                prefix = self.translator.prefix or ""
+                inputs = self.tokenizer([prefix + text for text in batch], padding=True, truncation=True, return_tensors="pt")
+                if "token_type_ids" in inputs:
+                    del inputs["token_type_ids"]
+        tokens = int(inputs["attention_mask"].sum())
+        self.metrics.count("tokens_in", tokens)
+        self.metrics.observe("batch_fill_ratio", tokens / inputs["attention_mask"].numel())
+        return inputs
+
+    def generate(self, inputs, **generate_kwargs):
+        """Translate a tokenized batch and decode the translations"""
+        kwargs = self.generation_kwargs(inputs["input_ids"].shape[-1])
+        kwargs.update(generate_kwargs)
+        with self.metrics.time("generate"):
+            if self.draft_model is not None and kwargs.get('num_beams', 1) == 1 and not kwargs.get('do_sample'):
+                output_ids = self._generate_assisted(inputs, kwargs)
+            else:
+                output_ids = self.model.generate(**inputs.to(self.model.device), generation_config=self.translator.generation_config, **kwargs)
+        pad_token_id = self.tokenizer.pad_token_id
+        self.metrics.count("tokens_out", int((output_ids != pad_token_id).sum()) if pad_token_id is not None else output_ids.numel())
+        self.metrics.count("batches")
+        self.metrics.count("sentences", len(output_ids))
+        with self.metrics.time("decode"):
+            return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+
+    def _try_encode(self, batch):
+        # Failed batches are encoded again piece by piece when generating
+        try:
+            return self.encode(batch)
+        except (RuntimeError, MemoryError) as exception:
+            self.logger.debug(f"Could not encode a batch of {len(batch)} sentence(s): {exception}")
+            return None
+
+    def _encoded_batches(self, batches, num_workers):
+        # Tokenize up to num_workers batches ahead while the current one is generated.
+        # A single thread is used since fast tokenizers are not safe to share across threads.
+        if not num_workers or num_workers < 1:
+            for batch in batches:
+                yield self._try_encode(batch)
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(self._try_encode, batch))
+                self.metrics.gauge("queue_depth", len(pending))
+                if len(pending) > num_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _generate_guarded(self, batch, inputs, batch_size, generate_kwargs):
+        # Halve batches that do not fit in memory and isolate inputs that cannot be translated
+        limit = self.guard.limit
+        if limit and len(batch) > limit:
+            return [t for s in range(0, len(batch), limit) for t in self._generate_guarded(batch[s:s + limit], None, batch_size, generate_kwargs)]
+        if len(batch) > 1 and self.guard.under_pressure():
+            self.metrics.count("memory_backoffs")
+            return self._split_batch(batch, batch_size, generate_kwargs)
+        try:
+            translations = self.generate(inputs if inputs is not None else self.encode(batch), **generate_kwargs)
+        except (RuntimeError, MemoryError) as exception:
+            self.guard.relieve()
+            if len(batch) > 1:
+                self.logger.debug(f"Batch of {len(batch)} sentence(s) failed, retrying in halves: {exception}")
+                if not is_out_of_memory(exception):
+                    # Bisect to isolate the faulty input without shrinking later batches
+                    failed, half = len(self.failed), len(batch) // 2
+                    translations = self._generate_guarded(batch[:half], None, batch_size, generate_kwargs) + self._generate_guarded(batch[half:], None, batch_size, generate_kwargs)
+                    if len(self.failed) - failed == len(batch):
+                        # Every input fails on its own too, the error does not come from the inputs
+                        del self.failed[failed:]
+                        raise
+                    return translations
+                self.metrics.count("memory_backoffs")
+                return self._split_batch(batch, batch_size, generate_kwargs)
+            self.logger.warning(f"Could not translate {batch[0][:50]!r}, keeping it untranslated: {exception}")
+            self.metrics.count("failed_inputs")
+            self.failed.append((batch[0], exception))
+            return list(batch)
+        self.guard.succeeded(len(batch), batch_size)
+        return translations
+
+    def _split_batch(self, batch, batch_size, generate_kwargs):
+        half = self.guard.back_off(len(batch))
+        return self._generate_guarded(batch[:half], None, batch_size, generate_kwargs) + self._generate_guarded(batch[half:], None, batch_size, generate_kwargs)
+
+    def _translate_batches(self, to_translate, num_workers, batch_size, generate_kwargs):
+        # Batch sentences of similar length together to limit padding and keep length caps tight
+        if self.token_cache is not None:
+            self.pretokenize(to_translate)
+            lengths = self.token_cache.lengths(to_translate)
+        else:
+            lengths = [len(text) for text in to_translate]
+        order = sorted(range(len(to_translate)), key=lengths.__getitem__, reverse=True)
+        size = min(batch_size, self.guard.limit or batch_size)
+        batches = [[to_translate[i] for i in order[s:s + size]] for s in range(0, len(order), size)]
+        translations = [None] * len(to_translate)
+        position = 0
+        failed = len(self.failed)
+        for batch, inputs in zip(batches, self._encoded_batches(batches, num_workers)):
+            for translation in self._generate_guarded(batch, inputs, batch_size, generate_kwargs):
+                translations[order[position]] = translation
+                position += 1
+        if to_translate and len(self.failed) - failed == len(to_translate):
+            # Every single input failing is not a memory issue
+            raise RuntimeError(f"Could not translate any of {len(to_translate)} input(s): {self.failed[-1][1]}") from self.failed[-1][1]
+        return translations
+
+    def _translate(self, to_translate, num_workers, batch_size, generate_kwargs):
+        translatable = range(len(to_translate))
+        if self.prefilter:
+            # Pass empty lines, numbers, URLs, code and such through without calling the model
+            translatable = split_translatable(to_translate)
+        if self.language_identifier is not None:
+            # Pass lines already written in the target language through
+            translatable = [i for i in translatable if not self.language_identifier.is_language(to_translate[i], self.target, self.langid_threshold)]
+        if len(translatable) < len(to_translate):
+            self.logger.debug(f"Passing {len(to_translate) - len(translatable)} input(s) through untranslated.")
+            translations = list(to_translate)
+            texts = [to_translate[i] for i in translatable]
+            for i, translation in zip(translatable, self._translate_memory(texts, num_workers, batch_size, generate_kwargs)):
+                translations[i] = translation
+            return translations
+        return self._translate_memory(to_translate, num_workers, batch_size, generate_kwargs)
+
+    def remember(self, sources, translations):
+        """Index already translated sentences in the translation memory"""
+        if self.memory is None:
+            return
+        for source, translation in zip(sources, translations):
+            self.memory.add(source, translation)
+
+    def _translate_memory(self, to_translate, num_workers, batch_size, generate_kwargs):
+        if self.memory is None or (generate_kwargs and self.memory_mode == "reuse"):
+            # Remembered translations were made with the default generation settings
+            return self._translate_skeletons(to_translate, num_workers, batch_size, generate_kwargs)
+        # Reuse (or flag) translations of near-duplicates of previously translated sentences
+        translations = [None] * len(to_translate)
+        pending, texts = {}, []
+        with self.metrics.time("cache_lookup"):
+            for i, text in enumerate(to_translate):
+                signature = self.memory.signature(text)
+                index, similarity = self.memory.match(text, signature)
+                if index is not None and self.memory_mode == "reuse":
+                    if index in pending:
+                        pending[index].append(i)
+                        continue
+                    if self.memory.translations[index] is not None:
+                        translations[i] = self.memory.translations[index]
+                        continue
+                elif index is not None:
+                    self.flagged.append((text, self.memory.sources[index], similarity))
+                pending[self.memory.add(text, signature=signature)] = [i]
+                texts.append(text)
+        self.metrics.count("cache_hits", len(to_translate) - len(pending))
+        self.logger.debug(f"Translation memory: {self.memory.stats()}")
+        for index, translation in zip(pending, self._translate_skeletons(texts, num_workers, batch_size, generate_kwargs)):
+            self.memory.set_translation(index, translation)
+            for i in pending[index]:
+                translations[i] = translation
+        return translations
+
+    def _translate_skeletons(self, to_translate, num_workers, batch_size, generate_kwargs):
+        if not self.templates:
+            return self._translate_texts(to_translate, num_workers, batch_size, generate_kwargs)
+        # Mask numbers, identifiers and placeholders so each distinct skeleton is translated once
+        with self.metrics.time("dedup"):
+            masked = [mask(text) for text in to_translate]
+            # Skeletons translated with other generation settings are translated again
+            settings = repr(sorted(generate_kwargs.items()))
+            translated = {}
+            untranslated = []
+            for skeleton in dict.fromkeys(skeleton for skeleton, _ in masked):
+                if (settings, skeleton) in self._skeletons:
+                    translated[skeleton] = self._skeletons[settings, skeleton]
+                    self._skeletons.move_to_end((settings, skeleton))
+                else:
+                    untranslated.append(skeleton)
+        self.metrics.count("template_hits", len(translated))
+        self.logger.debug(f"Translating {len(untranslated)} new skeleton(s) for {len(to_translate)} input(s).")
+        for skeleton, translation in zip(untranslated, self._translate_texts(untranslated, num_workers, batch_size, generate_kwargs)):
+            translated[skeleton] = translation
+            self._skeletons[settings, skeleton] = translation
+        while len(self._skeletons) > self.template_cache_size:
+            self._skeletons.popitem(last=False)
+        translations = [unmask(translated[skeleton], values) for skeleton, values in masked]
+        # Translate the original text when the slots did not survive translation
+        failed = [i for i, translation in enumerate(translations) if translation is None]
+        if failed:
+            self.logger.debug(f"Slots were lost for {len(failed)} input(s), translating them unmasked.")
+            texts = list(dict.fromkeys(to_translate[i] for i in failed))
+            fallback = dict(zip(texts, self._translate_texts(texts, num_workers, batch_size, generate_kwargs)))
+            for i in failed:
+                translations[i] = fallback[to_translate[i]]
+        return translations
+
+    def _translate_texts(self, to_translate, num_workers, batch_size, generate_kwargs):
+        if not to_translate:
+            return []
+        if self.segment_length:
+            # Split long paragraphs into sentences batched along with the other inputs
+            pieces, plan = segment(to_translate, self.segment_length, self.count_tokens)
+            if len(pieces) > len(to_translate):
+                self.logger.debug(f"Segmented {len(to_translate)} input(s) into {len(pieces)} piece(s).")
+            return reassemble(self._translate_batches(pieces, num_workers, batch_size, generate_kwargs), plan)
+        long_texts = [text for text in to_translate if len(text) > self.max_length]
+        if long_texts:
+            truncated = sum(1 for length in self.count_tokens(long_texts) if length > self.max_length)
+            if truncated:
+                self.logger.warning(f"{truncated} input(s) longer than {self.max_length} tokens will be truncated. Use sentence segmentation to translate them whole.")
+        return self._translate_batches(to_translate, num_workers, batch_size, generate_kwargs)
+
+    def dataset_fingerprint(self, dataset, column, output_column, generate_kwargs=None):
+        """Fingerprint of a translated dataset, the same for the same input, model, language pair and generation settings"""
+        from datasets.fingerprint import Hasher
+        config = getattr(self.model, "config", None)
+        return Hasher.hash({
+            'dataset': dataset._fingerprint,
+            'column': column,
+            'output_column': output_column,
+            'model_id': str(self.model_id),
+            'revision': getattr(config, "_commit_hash", None),
+            'backend': self.backend,
+            'source': self.source,
+            'target': self.target,
+            'max_length': self.max_length,
+            'num_beams': self.num_beams,
+            'early_stopping': self.early_stopping,
+            'length_ratio': self.length_ratio,
+            'length_offset': self.length_offset,
+            'segment_length': self.segment_length,
+            'prefilter': self.prefilter,
+            'templates': self.templates,
+            'langid': self.language_identifier is not None and self.langid_threshold,
+            'generate_kwargs': generate_kwargs or {},
+        })
+
+    def translate_dataset(self, dataset, column="text", output_column=None, num_proc=None, batch_size=None, map_batch_size=1000, cache_size=100000, **generate_kwargs):
+        """Add the translation of a column to a datasets.Dataset with a batched map.
+
+        The map has a fingerprint derived from the input, model, language pair and generation
+        settings, so repeated or interrupted runs on file backed datasets load the cached
+        (shards of the) result instead of translating again. Each map batch translates its
+        distinct texts once and reuses the translations of previous batches of the process.
+        With num_proc, processes share the torch threads of this one.
+        """
+        output_column = output_column or f"{column}_{self.target}"
+        fingerprint = self.dataset_fingerprint(dataset, column, output_column, generate_kwargs)
+        cache = TranslationCache(cache_size)
+        threads = max(1, torch.get_num_threads() // num_proc) if num_proc and num_proc > 1 else None
+
+        def _translate_batch(batch):
+            if threads:
+                torch.set_num_threads(threads)
+            texts = batch[column]
+            known, pending = {}, []
+            for text in texts:
+                if not isinstance(text, str) or not text.strip() or text in known:
+                    continue
+                known[text] = cache.get(text)
+                if known[text] is None:
+                    pending.append(text)
+            for text, translation in zip(pending, self.translate(pending, batch_size=batch_size, **generate_kwargs) if pending else []):
+                known[text] = translation
+                cache.put(text, translation)
+            self.metrics.count("cache_hits", len(texts) - len(pending))
+            return {output_column: [known.get(text, text) if isinstance(text, str) else text for text in texts]}
+
+        return dataset.map(_translate_batch, batched=True, batch_size=map_batch_size, num_proc=num_proc, new_fingerprint=fingerprint, desc=f"Translating {column} to {self.target}")
+
+    def stream(self, text, callback=None, **generate_kwargs):
+        """Translate a single text, yielding its translation piece by piece as the tokens are generated.
+
+        Each piece is also passed to callback when one is given. Beam search cannot stream,
+        its translation comes in one piece.
+        """
+        kwargs = dict(generate_kwargs)
+        num_beams = kwargs.get('num_beams') or self.num_beams or getattr(self.translator.generation_config, "num_beams", 1) or 1
+        if num_beams > 1 or not text.strip() or self.templates or self.segment_length:
+            # Masked and segmented texts are translated whole
+            pieces = self.translate([text], **kwargs)
+        else:
+            pieces = self._stream_stages(text, kwargs)
+        for piece in pieces:
+            if callback:
+                callback(piece)
+            yield piece
+
+    def _stream_stages(self, text, generate_kwargs):
+        # Pass the text through the stages translate applies, only stream what reaches the model
+        if self.prefilter and not is_translatable(text):
+            yield text
+            return
+        if self.language_identifier is not None and self.language_identifier.is_language(text, self.target, self.langid_threshold):
+            yield text
+            return
+        if self.memory is None or (generate_kwargs and self.memory_mode == "reuse"):
+            yield from self._stream(text, generate_kwargs)
+            return
+        signature = self.memory.signature(text)
+        index, similarity = self.memory.match(text, signature)
+        if index is not None and self.memory_mode == "reuse" and self.memory.translations[index] is not None:
+            self.metrics.count("cache_hits")
+            yield self.memory.translations[index]
+            return
+        if index is not None and self.memory_mode != "reuse":
+            self.flagged.append((text, self.memory.sources[index], similarity))
+        index = self.memory.add(text, signature=signature)
+        pieces = []
+        for piece in self._stream(text, generate_kwargs):
+            pieces.append(piece)
+            yield piece
+        self.memory.set_translation(index, "".join(pieces))
+
+    def _stream(self, text, generate_kwargs):
+        inputs = self.encode([text])
+        kwargs = self.generation_kwargs(inputs["input_ids"].shape[-1])
+        kwargs.update(generate_kwargs)
+        # Skip the decoder start tokens, pieces end on word boundaries
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+        failure = []
+
+        def _generate():
+            try:
+                self.model.generate(**inputs.to(self.model.device), generation_config=self.translator.generation_config, streamer=streamer, **kwargs)
+            except Exception as exception:
+                failure.append(exception)
+                streamer.end()
+
+        _t = time.perf_counter()
+        thread = threading.Thread(target=_generate, daemon=True)
+        thread.start()
+        first = True
+        with self.metrics.time("generate"):
+            for piece in streamer:
+                if not piece:
+                    continue
+                if first:
+                    self.metrics.observe("first_output_seconds", time.perf_counter() - _t)
+                    first = False
+                yield piece
+            thread.join()
+        if failure:
+            # A single input failing is not a memory issue, as in translate
+            self.guard.relieve()
+            self.logger.warning(f"Could not translate {text[:50]!r}: {failure[0]}")
+            self.metrics.count("failed_inputs")
+            self.failed.append((text, failure[0]))
+            raise RuntimeError(f"Could not translate any of 1 input(s): {failure[0]}") from failure[0]
+        self.metrics.count("batches")
+        self.metrics.count("sentences")
+
+    def translate(self, to_translate, num_workers=None, batch_size=None, **generate_kwargs):
+
         if not num_workers: num_workers=self.n_proc
         if not batch_size: batch_size=self.batch_size
+        if isinstance(to_translate, str): to_translate = [to_translate]
 
         try:
-            return [x['translation_text'] for x in self.translator(to_translate, num_workers=num_workers, batch_size=batch_size)]
+            with self.metrics.time("translate", track_rss=True):
+                return self._translate(list(to_translate), num_workers, batch_size, generate_kwargs)
         except UserWarning:
             pass
         except RuntimeError as re:
@@ -0,0 +1,127 @@
+import os
+import logging
+
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from translator import utils
+from translator.records import TranslationCache
+
+logger = logging.getLogger(__name__)
+
+def find_text_files(directory, exclude=None):
+    """Find the text files, compressed or not, under a directory recursively, skipping temporary files and the exclude directory"""
+    exclude = os.path.abspath(exclude) if exclude else None
+    files = []
+    for root, dirs, names in os.walk(directory):
+        # Never read back an output tree nested in the input tree
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude and not d.endswith(".tmp.cache"))
+        for name in sorted(names):
+            stem, _ = utils.split_compression(name)
+            if stem.endswith(".txt") and not stem.endswith(".tmp.txt") and not name.endswith(".part"):
+                files.append(os.path.join(root, name))
+    return files
+
+def mirror_path(path, source_root, output_root):
+    """Get the path of a file of the input tree in the output tree"""
+    return os.path.join(output_root, os.path.relpath(path, source_root))
+
+def _write(path, lines):
+    # Written aside and moved in place so an existing output is always complete
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    stem, compression = utils.split_compression(path)
+    part = f"{stem}.part{compression}"
+    utils.save_txt(lines, part)
+    os.replace(part, path)
+
+class TreeTranslator:
+    """Translate a tree of text files into a mirrored tree, one output file per input file.
+
+    Files are read ahead by a thread pool. The distinct lines of consecutive files are
+    pooled until chunk_size of them need translating, then translated together, and every
+    file whose lines are all known is written right away. Lines translated earlier come
+    from a bounded cache, outputs that exist already are kept unless forced.
+    """
+
+    def __init__(self, translate, chunk_size=10000, threads=4, cache_size=100000, force=False) -> None:
+        self.translate = translate
+        self.chunk_size = chunk_size
+        self.threads = max(1, threads or 1)
+        self.cache = TranslationCache(cache_size)
+        self.force = force
+        self.files = 0
+        self.skipped = 0
+        self.lines = 0
+        self.translated = 0
+
+    def run(self, inputs, outputs, on_file=None):
+        """Translate each input file into its output file, returns the number of files written"""
+        todo = [(i, o) for i, o in zip(inputs, outputs) if self.force or not Path(o).is_file()]
+        self.skipped += len(inputs) - len(todo)
+        pending = deque()
+        queued = {}
+        resolved = {}
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            writes = []
+            # Reads run ahead of translation, at most twice as many files as threads
+            reads = deque()
+            files = iter(todo)
+            for _ in range(2 * self.threads):
+                self._read_next(pool, files, reads)
+            while reads:
+                source, output, future = reads.popleft()
+                self._read_next(pool, files, reads)
+                lines = future.result()
+                self.lines += len(lines)
+                waiting = False
+                for line in lines:
+                    if line in resolved or line in queued or not line.strip():
+                        waiting = waiting or line in queued
+                        continue
+                    translation = self.cache.get(line)
+                    if translation is None:
+                        queued[line] = None
+                        waiting = True
+                    else:
+                        resolved[line] = translation
+                if waiting:
+                    pending.append((source, output, lines))
+                else:
+                    writes.append(self._submit_write(pool, source, output, lines, resolved, on_file))
+                if len(queued) >= self.chunk_size:
+                    writes += self._flush(pool, pending, queued, resolved, on_file)
+            writes += self._flush(pool, pending, queued, resolved, on_file)
+            for write in writes:
+                write.result()
+        return self.files
+
+    def _read_next(self, pool, files, reads):
+        for source, output in files:
+            reads.append((source, output, pool.submit(utils.read_txt, source)))
+            return
+
+    def _flush(self, pool, pending, queued, resolved, on_file):
+        texts = list(queued)
+        if texts:
+            translations = self.translate(texts)
+            if len(translations) != len(texts):
+                raise RuntimeError(f"{len(translations)} translation(s) for {len(texts)} line(s).")
+            for text, translation in zip(texts, translations):
+                resolved[text] = translation
+                self.cache.put(text, translation)
+            self.translated += len(texts)
+            logger.debug(f"Translated {len(texts)} distinct line(s) for {len(pending)} file(s).")
+        writes = [self._submit_write(pool, source, output, lines, resolved, on_file) for source, output, lines in pending]
+        pending.clear()
+        queued.clear()
+        resolved.clear()
+        return writes
+
+    def _submit_write(self, pool, source, output, lines, resolved, on_file):
+        translations = [resolved.get(line, line) for line in lines]
+        self.files += 1
+        future = pool.submit(_write, output, translations)
+        if on_file:
+            future.add_done_callback(lambda f: f.exception() is None and on_file(source, output, len(lines)))
+        return future
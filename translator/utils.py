@@ -1,24 +1,95 @@
+import io
 import time
 import os
+import gzip
+import lzma
 
 from pathlib import Path
 from glob import glob
 import polib
 
+from translator.language import NLLB
+
+def get_cache_dir(*parts):
+    """Get the persistent cache directory of translator (INTERPRES_CACHE or XDG cache)"""
+    root = os.environ.get('INTERPRES_CACHE') or os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'interpres')
+    return Path(root, *parts)
+
+COMPRESSIONS = {'.gz': "gzip", '.zst': "zstd", '.zstd': "zstd", '.xz': "xz"}
+MAGIC_BYTES = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd", b"\xfd7zXZ\x00": "xz"}
+
+def split_compression(path):
+    """Split a path into the path without its compression suffix and that suffix ("" if none)"""
+    path = str(path)
+    for suffix in COMPRESSIONS:
+        if path.lower().endswith(suffix):
+            return path[:-len(suffix)], path[-len(suffix):]
+    return path, ""
+
+def get_compression(path, mode='r'):
+    """Get the compression of a file from its suffix, or from its magic bytes when reading it"""
+    compression = COMPRESSIONS.get(split_compression(path)[1].lower())
+    if compression or 'r' not in mode or not Path(path).is_file():
+        return compression
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    return next((c for magic, c in MAGIC_BYTES.items() if head.startswith(magic)), None)
+
+def open_text(path, mode='r', threads=None, newline=None):
+    """Open a text file, gzip, zstd or xz compressed or not, (de)compressing it as a stream.
+
+    zstd compresses with all cores and gzip uses python-isal threads when installed.
+    """
+    compression = get_compression(path, mode)
+    threads = threads or os.cpu_count() or 1
+    if compression == "gzip":
+        try:
+            from isal import igzip_threaded
+            return igzip_threaded.open(path, f"{mode}t", encoding="utf-8", newline=newline, threads=threads)
+        except ImportError:
+            return gzip.open(path, f"{mode}t", encoding="utf-8", newline=newline)
+    if compression == "xz":
+        return lzma.open(path, f"{mode}t", encoding="utf-8", newline=newline)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise NotImplementedError(f"zstandard is not installed, run `pip install zstandard` to read and write {path}.")
+        if 'r' in mode:
+            # Appended outputs hold several frames
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+            return io.TextIOWrapper(reader, encoding="utf-8", newline=newline)
+        return zstandard.open(path, f"{mode}t", cctx=zstandard.ZstdCompressor(level=3, threads=-1 if threads > 1 else 0), encoding="utf-8", newline=newline)
+    return open(path, mode, newline=newline)
+
+def get_resume_paths(output_path, source_language, target_language):
+    """Get the cache directory of an output file and the file of source sentences translated into it.
+
+    The sources are compressed like the output.
+    """
+    output_path, compression = split_compression(output_path)
+    stem, _ = os.path.splitext(output_path)
+    cache = f"{stem}.{source_language}.{target_language}.tmp.cache"
+    return cache, f"{cache}/{os.path.basename(output_path)}.{source_language}.txt{compression}"
+
 def save_txt(translations, file_path, append=False):
-    with open(file_path, 'w' if not append else 'a') as f:
+    with open_text(file_path, 'w' if not append else 'a') as f:
         f.write("\n".join(translations))
 
 def read_txt(filepath):
     p = Path(filepath)
     if p.exists() and p.is_file():
-        with open(p, 'r') as f:
+        with open_text(p, 'r') as f:
             return f.read().split("\n")
     else:
         return []
 
 def glob_files_from_dir(directory, suffix=".txt"):
-    return list(set(glob(f"{directory}/*{suffix}")) - set(glob(f"{directory}/*.tmp{suffix}")))
+    suffixes = [suffix] + ([f"{suffix}{compression}" for compression in COMPRESSIONS] if suffix != "*" else [])
+    files = set()
+    for s in suffixes:
+        files |= set(glob(f"{directory}/*{s}")) - set(glob(f"{directory}/*.tmp{s}"))
+    return list(files)
 
 def read_txt_files(directory):
     r = []
@@ -74,7 +145,7 @@ def get_po_language(po_file):
     
     return None
 
-def should_translate_po_file(po_file, target_language):
+def should_translate_po_file(po_file, target_language, languages=NLLB):
     """Determine if a PO file should be translated based on its language metadata matching target language"""
     po_language = get_po_language(po_file)
     
@@ -83,7 +154,7 @@ def should_translate_po_file(po_file, target_language):
         return False  # Require explicit Language metadata for safety
     
     # Convert target language to short code for comparison
-    target_short = nllb_to_short_code(target_language)
+    target_short = nllb_to_short_code(target_language, languages)
     
     # Handle common language code variations - check if PO language matches target
     po_lang_lower = po_language.lower()
@@ -141,212 +212,20 @@ def save_po_file(po_file, filepath):
     """Save PO file to specified path"""
     po_file.save(filepath)
 
-def normalize_language_code(lang_code):
-    """Convert short language codes to NLLB format and vice versa"""
-    if not lang_code:
-        return lang_code
-        
-    # Common mappings from short codes to NLLB codes
-    short_to_nllb = {
-        'en': 'eng_Latn',
-        'fr': 'fra_Latn', 
-        'es': 'spa_Latn',
-        'de': 'deu_Latn',
-        'it': 'ita_Latn',
-        'pt': 'por_Latn',
-        'ru': 'rus_Cyrl',
-        'ja': 'jpn_Jpan',
-        'ko': 'kor_Hang',
-        'zh': 'zho_Hans',
-        'ar': 'arb_Arab',
-        'hi': 'hin_Deva',
-        'bn': 'ben_Beng',
-        'tr': 'tur_Latn',
-        'nl': 'nld_Latn',
-        'sv': 'swe_Latn',
-        'da': 'dan_Latn',
-        'no': 'nob_Latn',
-        'fi': 'fin_Latn',
-        'pl': 'pol_Latn',
-        'cs': 'ces_Latn',
-        'hu': 'hun_Latn',
-        'ro': 'ron_Latn',
-        'uk': 'ukr_Cyrl',
-        'bg': 'bul_Cyrl',
-        'hr': 'hrv_Latn',
-        'sk': 'slk_Latn',
-        'sl': 'slv_Latn',
-        'et': 'est_Latn',
-        'lv': 'lvs_Latn',
-        'lt': 'lit_Latn',
-        'mt': 'mlt_Latn',
-        'el': 'ell_Grek',
-        'cy': 'cym_Latn',
-        'ga': 'gle_Latn',
-        'eu': 'eus_Latn',
-        'ca': 'cat_Latn',
-        'gl': 'glg_Latn',
-        'is': 'isl_Latn',
-        'mk': 'mkd_Cyrl',
-        'sq': 'als_Latn',
-        'be': 'bel_Cyrl',
-        'ka': 'kat_Geor',
-        'hy': 'hye_Armn',
-        'az': 'azj_Latn',
-        'kk': 'kaz_Cyrl',
-        'ky': 'kir_Cyrl',
-        'uz': 'uzn_Latn',
-        'tk': 'tuk_Latn',
-        'mn': 'khk_Cyrl',
-        'th': 'tha_Thai',
-        'vi': 'vie_Latn',
-        'id': 'ind_Latn',
-        'ms': 'zsm_Latn',
-        'tl': 'tgl_Latn',
-        'my': 'mya_Mymr',
-        'km': 'khm_Khmr',
-        'lo': 'lao_Laoo',
-        'am': 'amh_Ethi',
-        'ti': 'tir_Ethi',
-        'or': 'ory_Orya',
-        'as': 'asm_Beng',
-        'ur': 'urd_Arab',
-        'fa': 'pes_Arab',
-        'ps': 'pbt_Arab',
-        'sd': 'snd_Arab',
-        'ne': 'npi_Deva',
-        'si': 'sin_Sinh',
-        'ta': 'tam_Taml',
-        'te': 'tel_Telu',
-        'kn': 'kan_Knda',
-        'ml': 'mal_Mlym',
-        'gu': 'guj_Gujr',
-        'pa': 'pan_Guru',
-        'mr': 'mar_Deva',
-        'sa': 'san_Deva',
-        'sw': 'swh_Latn',
-        'yo': 'yor_Latn',
-        'ig': 'ibo_Latn',
-        'ha': 'hau_Latn',
-        'zu': 'zul_Latn',
-        'xh': 'xho_Latn',
-        'af': 'afr_Latn',
-        'he': 'heb_Hebr',
-        'yi': 'ydd_Hebr',
-    }
-    
-    # If it's a short code, convert to NLLB
-    if lang_code.lower() in short_to_nllb:
-        return short_to_nllb[lang_code.lower()]
-    
-    # If it's already an NLLB code, return as is
-    if '_' in lang_code and len(lang_code) > 3:
-        return lang_code
-        
-    # Return as is if no mapping found
-    return lang_code
+def normalize_language_code(lang_code, languages=NLLB):
+    """Convert short language codes to the codes of the model (NLLB by default)"""
+    return languages.normalize(lang_code)
 
-def nllb_to_short_code(nllb_code):
-    """Convert NLLB language code to short code for directory matching"""
-    short_to_nllb = {
-        'en': 'eng_Latn',
-        'fr': 'fra_Latn', 
-        'es': 'spa_Latn',
-        'de': 'deu_Latn',
-        'it': 'ita_Latn',
-        'pt': 'por_Latn',
-        'ru': 'rus_Cyrl',
-        'ja': 'jpn_Jpan',
-        'ko': 'kor_Hang',
-        'zh': 'zho_Hans',
-        'ar': 'arb_Arab',
-        'hi': 'hin_Deva',
-        'bn': 'ben_Beng',
-        'tr': 'tur_Latn',
-        'nl': 'nld_Latn',
-        'sv': 'swe_Latn',
-        'da': 'dan_Latn',
-        'no': 'nob_Latn',
-        'fi': 'fin_Latn',
-        'pl': 'pol_Latn',
-        'cs': 'ces_Latn',
-        'hu': 'hun_Latn',
-        'ro': 'ron_Latn',
-        'uk': 'ukr_Cyrl',
-        'bg': 'bul_Cyrl',
-        'hr': 'hrv_Latn',
-        'sk': 'slk_Latn',
-        'sl': 'slv_Latn',
-        'et': 'est_Latn',
-        'lv': 'lvs_Latn',
-        'lt': 'lit_Latn',
-        'mt': 'mlt_Latn',
-        'el': 'ell_Grek',
-        'cy': 'cym_Latn',
-        'ga': 'gle_Latn',
-        'eu': 'eus_Latn',
-        'ca': 'cat_Latn',
-        'gl': 'glg_Latn',
-        'is': 'isl_Latn',
-        'mk': 'mkd_Cyrl',
-        'sq': 'als_Latn',
-        'be': 'bel_Cyrl',
-        'ka': 'kat_Geor',
-        'hy': 'hye_Armn',
-        'az': 'azj_Latn',
-        'kk': 'kaz_Cyrl',
-        'ky': 'kir_Cyrl',
-        'uz': 'uzn_Latn',
-        'tk': 'tuk_Latn',
-        'mn': 'khk_Cyrl',
-        'th': 'tha_Thai',
-        'vi': 'vie_Latn',
-        'id': 'ind_Latn',
-        'ms': 'zsm_Latn',
-        'tl': 'tgl_Latn',
-        'my': 'mya_Mymr',
-        'km': 'khm_Khmr',
-        'lo': 'lao_Laoo',
-        'am': 'amh_Ethi',
-        'ti': 'tir_Ethi',
-        'or': 'ory_Orya',
-        'as': 'asm_Beng',
-        'ur': 'urd_Arab',
-        'fa': 'pes_Arab',
-        'ps': 'pbt_Arab',
-        'sd': 'snd_Arab',
-        'ne': 'npi_Deva',
-        'si': 'sin_Sinh',
-        'ta': 'tam_Taml',
-        'te': 'tel_Telu',
-        'kn': 'kan_Knda',
-        'ml': 'mal_Mlym',
-        'gu': 'guj_Gujr',
-        'pa': 'pan_Guru',
-        'mr': 'mar_Deva',
-        'sa': 'san_Deva',
-        'sw': 'swh_Latn',
-        'yo': 'yor_Latn',
-        'ig': 'ibo_Latn',
-        'ha': 'hau_Latn',
-        'zu': 'zul_Latn',
-        'xh': 'xho_Latn',
-        'af': 'afr_Latn',
-        'he': 'heb_Hebr',
-        'yi': 'ydd_Hebr',
-    }
-    
-    # Create reverse mapping
-    nllb_to_short = {v: k for k, v in short_to_nllb.items()}
-    
-    return nllb_to_short.get(nllb_code, nllb_code.split('_')[0] if '_' in nllb_code else nllb_code)
+def nllb_to_short_code(nllb_code, languages=NLLB):
+    """Convert a language code of the model (NLLB by default) to short code for directory matching"""
+    return languages.short_code(nllb_code)
 
-def glob_po_files_for_target_language(directory, target_language, suffix=".po"):
+def glob_po_files_for_target_language(directory, target_language, suffix=".po", languages=NLLB):
     """Get PO files from target language directories only"""
     po_files = []
     
     # Convert target language to short code for directory matching
-    target_short = nllb_to_short_code(target_language)
+    target_short = nllb_to_short_code(target_language, languages)
     
     for root, dirs, files in os.walk(directory):
         for file in files:
@@ -371,7 +250,7 @@ def glob_po_files_for_target_language(directory, target_language, suffix=".po"):
     
     return po_files
 
-def detect_target_languages_from_directory(directory):
+def detect_target_languages_from_directory(directory, languages=NLLB):
     """Detect all target languages available in the directory structure"""
     target_languages = set()
     
@@ -387,8 +266,8 @@ def detect_target_languages_from_directory(directory):
                     
                     if lang_metadata:
                         # Convert short code to NLLB format if needed
-                        target_lang = normalize_language_code(lang_metadata)
-                        if target_lang != 'eng_Latn':  # Don't include source language
+                        target_lang = normalize_language_code(lang_metadata, languages)
+                        if target_lang != languages.normalize('en'):  # Don't include source language
                             target_languages.add(target_lang)
                 except Exception:
                     # Skip files that can't be read